@@ -1,6 +1,8 @@
 from flask import Flask, request, make_response
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy import event
+from sqlalchemy.orm import DeclarativeBase, raiseload
+from sqlalchemy.exc import IntegrityError
 import os
 from werkzeug.middleware.proxy_fix import ProxyFix
 import logging
@@ -22,16 +24,41 @@ app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
     'pool_pre_ping': True,
     "pool_recycle": 300,
+    "query_cache_size": 1200,
+    "insertmanyvalues_page_size": 1000,
 }
+# psycopg2 only: also batch executemany UPDATE/DELETE (INSERTs already use multi-row VALUES)
+if (app.config["SQLALCHEMY_DATABASE_URI"] or "").startswith(("postgresql://", "postgresql+psycopg2://")):
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"]["executemany_mode"] = "values_plus_batch"
+
+# Make unplanned lazy loads raise so N+1 patterns surface in dev/test.
+# Queries must then eager-load any relationship they touch.
+app.config["STRICT_LOADING"] = os.environ.get("STRICT_LOADING", "False").lower() == "true"
 
 # No need to call db.init_app(app) here, it's already done in the constructor.
 db = SQLAlchemy(app, model_class=Base)
 
+if app.config["STRICT_LOADING"]:
+    @event.listens_for(db.session, "do_orm_execute")
+    def _apply_strict_loading(execute_state):
+        if (execute_state.is_select
+                and not execute_state.is_column_load
+                and not execute_state.is_relationship_load):
+            execute_state.statement = execute_state.statement.options(raiseload('*', sql_only=True))
+
+# Optional per-request profiling (SCHOOL_PROFILING_ENABLED=1)
+from profiling import init_profiling
+init_profiling(app)
+
 # Add cache-busting headers for all HTML responses
 @app.after_request
 def add_cache_headers(response):
     if request.endpoint and response.content_type.startswith('text/html'):
-        response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
+        if 'ETag' in response.headers:
+            # Tagged pages may be stored, but must be revalidated on every use
+            response.headers['Cache-Control'] = 'private, no-cache'
+        else:
+            response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
         response.headers['Pragma'] = 'no-cache'
         response.headers['Expires'] = '0'
     return response
@@ -56,7 +83,7 @@ csrf = CSRFProtect(app)
 @login_manager.user_loader
 def load_user(user_id):
     from models import User
-    return User.query.get(int(user_id))
+    return db.session.get(User, int(user_id))
 
 # Create tables and default admin user
 # Need to put this in module-level to make it work with Gunicorn.
@@ -66,6 +93,15 @@ with app.app_context():
     # Create tables if they don't exist
     db.create_all()
     
+    # Seed the data version counter that the ETag checks read
+    if db.session.get(models.StateVersion, models.STATE_VERSION_ID) is None:
+        try:
+            db.session.add(models.StateVersion(id=models.STATE_VERSION_ID, version=0))
+            db.session.commit()
+        except IntegrityError:
+            # Another worker seeded it first
+            db.session.rollback()
+    
     # Create default admin user only if no admin exists
     admin_user = models.User.query.filter_by(username='admin').first()
     if not admin_user:
@@ -15,13 +15,62 @@ import data_store as file_store
 import uuid
 from datetime import datetime
 import logging
+from sqlalchemy import text
 
 logger = logging.getLogger(__name__)
 
+def ensure_indexes():
+    """Create model indexes that db.create_all() skips on existing tables"""
+    for table in (Route.__table__, Student.__table__, Staff.__table__):
+        for index in table.indexes:
+            try:
+                index.create(bind=db.engine, checkfirst=True)
+            except Exception as e:
+                logger.warning(f"Could not create index {index.name}: {e}")
+    
+    # Trigram index so route_number LIKE '%...%' searches can avoid a seq scan.
+    # Kept out of the model metadata because it needs the pg_trgm extension.
+    if db.engine.dialect.name == 'postgresql':
+        try:
+            with db.engine.begin() as conn:
+                conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+                conn.execute(text("CREATE INDEX IF NOT EXISTS ix_routes_route_number_trgm "
+                                  "ON routes USING gin (route_number gin_trgm_ops)"))
+        except Exception as e:
+            logger.warning(f"Could not create index ix_routes_route_number_trgm: {e}")
+
+def ensure_column_defaults():
+    """Add timestamp server defaults that db.create_all() skips on existing tables.
+    
+    Both timestamp columns are plain (naive) timestamps; tables created while
+    updated_at was declared with timezone=True are converted back, reading
+    the stored instants in the session time zone that now() also uses.
+    """
+    if db.engine.dialect.name != 'postgresql':
+        return
+    for model in (School, Route, Student, Provider, Area, Staff):
+        table = model.__tablename__
+        try:
+            with db.engine.begin() as conn:
+                tz_columns = conn.execute(text(
+                    "SELECT column_name FROM information_schema.columns "
+                    "WHERE table_name = :table AND column_name IN ('created_at', 'updated_at') "
+                    "AND data_type = 'timestamp with time zone'"
+                ), {'table': table}).scalars().all()
+                for column in tz_columns:
+                    conn.execute(text(f"ALTER TABLE {table} ALTER COLUMN {column} TYPE timestamp without time zone"))
+                conn.execute(text(f"ALTER TABLE {table} ALTER COLUMN created_at SET DEFAULT now()"))
+                conn.execute(text(f"ALTER TABLE {table} ALTER COLUMN updated_at SET DEFAULT now()"))
+        except Exception as e:
+            logger.warning(f"Could not set timestamp defaults on {table}: {e}")
+
 def auto_migrate():
     """Automatically migrate data if database is empty"""
     
     with app.app_context():
+        ensure_indexes()
+        ensure_column_defaults()
+        
         # Check if database already has data
         existing_students = Student.query.count()
         existing_routes = Route.query.count()
@@ -30,7 +30,7 @@ def save_data_to_file():
         def serialize_datetime(obj):
             if isinstance(obj, datetime):
                 return obj.isoformat()
-            return obj
+            raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
         
         data = {
             'schools': schools,
@@ -41,24 +41,26 @@ def save_data_to_file():
             'areas': areas
         }
         
-        # Convert datetime objects recursively
-        import copy
-        data_copy = copy.deepcopy(data)
-        for category in data_copy.values():
-            for item in category.values():
-                if isinstance(item, dict):
-                    for key, value in item.items():
-                        if isinstance(value, datetime):
-                            item[key] = value.isoformat()
-        
-        with open(PERSISTENCE_FILE, 'w') as f:
-            json.dump(data_copy, f)
+        # Write the whole store to a temp file and swap it in, so a batch of
+        # mutations lands in one write and a crash never leaves a partial file
+        temp_file = f"{PERSISTENCE_FILE}.tmp"
+        with open(temp_file, 'w') as f:
+            json.dump(data, f, default=serialize_datetime)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_file, PERSISTENCE_FILE)
         print(f"Data saved to {PERSISTENCE_FILE}")
     except Exception as e:
         print(f"Error saving data: {e}")
 
-def load_data_from_file():
-    """Load data from temporary file if it exists"""
+def load_data_from_file(sections=None):
+    """Load data from temporary file if it exists
+    
+    sections optionally names the categories the caller will use (e.g.
+    ['routes', 'students']). Every category is still loaded, so a later save
+    keeps all data, but only the named ones get their timestamps converted
+    back to datetime objects; the rest keep their ISO strings.
+    """
     global schools, routes, staff, students, providers, areas
     
     try:
@@ -75,7 +77,11 @@ def load_data_from_file():
             areas = data.get('areas', {})
             
             # Convert datetime strings back to datetime objects
-            for category in [schools, routes, staff, students, providers, areas]:
+            categories = {'schools': schools, 'routes': routes, 'staff': staff,
+                          'students': students, 'providers': providers, 'areas': areas}
+            if sections is not None:
+                categories = {name: categories[name] for name in sections if name in categories}
+            for category in categories.values():
                 for item in category.values():
                     if isinstance(item, dict):
                         for key, value in item.items():
@@ -85,6 +91,7 @@ def load_data_from_file():
                                 except:
                                     item[key] = datetime.now()
             
+            _rebuild_route_number_index()
             print(f"Data loaded from {PERSISTENCE_FILE}: {len(schools)} schools, {len(routes)} routes")
             return True
     except Exception as e:
@@ -195,12 +202,71 @@ def get_route(route_id):
     """Get a specific route by ID"""
     return routes.get(route_id)
 
+# Lazily built (provider_id, route_number) -> route id index. provider_id None
+# covers lookups by number alone. The index remembers the routes state it was
+# built for (a version bumped by route writes, plus the dict's identity and
+# size); a miss only triggers a rebuild when that state has moved on, and hits
+# are checked against the live route. Route numbers, providers and membership
+# must therefore only change through create_route/create_routes_bulk,
+# update_route, delete_route or load_data_from_file: a direct edit to the
+# dict that keeps its size (e.g. one delete plus one add) is not detected,
+# and a lookup for the added route would miss.
+_route_number_index = {}
+_routes_version = 0
+_route_index_state = None
+
+def _routes_state():
+    return (_routes_version, id(routes), len(routes))
+
+def _bump_routes_version():
+    """Mark route numbers/providers as possibly changed"""
+    global _routes_version
+    _routes_version += 1
+
+def _index_route(route_id, route):
+    """Add a route to the route number index, keeping the first match"""
+    _route_number_index.setdefault((None, route.get('route_number')), route_id)
+    _route_number_index.setdefault((route.get('provider_id'), route.get('route_number')), route_id)
+
+def _index_new_route(route_id, route):
+    """Index a route just added to the routes dict without invalidating the index"""
+    global _route_index_state
+    was_current = _route_index_state == (_routes_version, id(routes), len(routes) - 1)
+    _index_route(route_id, route)
+    if was_current:
+        _route_index_state = _routes_state()
+
+def _rebuild_route_number_index():
+    """Rebuild the route number index from the routes dict"""
+    global _route_index_state
+    _route_number_index.clear()
+    for route_id, route in routes.items():
+        _index_route(route_id, route)
+    _route_index_state = _routes_state()
+
+def get_route_by_number(route_number, provider_id=None):
+    """Get the first route with a route number, optionally for one provider"""
+    key = (provider_id, route_number)
+    route = routes.get(_route_number_index.get(key))
+    if (route is None or route.get('route_number') != route_number or
+            (provider_id is not None and route.get('provider_id') != provider_id)):
+        if route is None and _route_index_state == _routes_state():
+            return None
+        _rebuild_route_number_index()
+        route = routes.get(_route_number_index.get(key))
+    return route
+
 def get_school_routes(school_id):
     """Get all routes for a specific school"""
     return {route_id: route_data for route_id, route_data in routes.items() if route_data['school_id'] == school_id}
 
-def create_route(school_id, route_number, provider_id, area_id):
-    """Create a new route"""
+def create_route(school_id, route_number, provider_id, area_id, extra_fields=None, assign_student_id=None):
+    """Create a new route
+    
+    extra_fields are merged into the new route, and assign_student_id (if it
+    names an existing student) is moved onto it, so callers need no follow-up
+    writes. Like before, this does not save.
+    """
     route_id = generate_id()
     route = {
         'id': route_id,
@@ -214,14 +280,54 @@ def create_route(school_id, route_number, provider_id, area_id):
         'created_at': datetime.now(),
         'updated_at': datetime.now()
     }
+    if extra_fields:
+        route.update(extra_fields)
     routes[route_id] = route
+    _index_new_route(route_id, route)
+    if assign_student_id in students:
+        _move_student_to_route(assign_student_id, route_id)
     return route
 
+def create_routes_bulk(route_specs):
+    """Create several routes at once from dicts of create_route arguments.
+    
+    A spec may also carry 'extra_fields' and a list of 'student_ids' to move
+    onto the new route. Returns the new routes in the same order. Like
+    create_route, this does not save.
+    """
+    now = datetime.now()
+    created = []
+    for spec in route_specs:
+        route_id = generate_id()
+        route = {
+            'id': route_id,
+            'school_id': spec['school_id'],
+            'route_number': spec['route_number'],
+            'provider_id': spec['provider_id'],
+            'area_id': spec['area_id'],
+            'guide_present': True,  # Default: guide is present
+            'student_ids': [],
+            'status': BUS_STATUS_NOT_PRESENT,  # Default status
+            'created_at': now,
+            'updated_at': now
+        }
+        if spec.get('extra_fields'):
+            route.update(spec['extra_fields'])
+        routes[route_id] = route
+        _index_new_route(route_id, route)
+        for student_id in spec.get('student_ids', ()):
+            if student_id in students:
+                _move_student_to_route(student_id, route_id)
+        created.append(route)
+    return created
+
 def update_route(route_id, updates):
     """Update an existing route with dictionary of updates"""
     if route_id in routes:
         routes[route_id].update(updates)
         routes[route_id]['updated_at'] = datetime.now()
+        if 'route_number' in updates or 'provider_id' in updates:
+            _bump_routes_version()
         save_data_to_file()  # Persist changes
         return routes[route_id]
     return None
@@ -235,6 +341,7 @@ def delete_route(route_id):
                 students[student_id]['route_id'] = None
         
         del routes[route_id]
+        _bump_routes_version()
         return True
     return False
 
@@ -466,6 +573,13 @@ def get_student(student_id):
     """Get a specific student by ID"""
     return students.get(student_id)
 
+def get_students_by_route():
+    """Get students grouped by route ID, built in a single pass"""
+    students_by_route = {}
+    for student in students.values():
+        students_by_route.setdefault(student.get('route_id'), []).append(student)
+    return students_by_route
+
 def create_student(name, grade, class_name, parent_name, parent_phone, address, 
                   has_medical_needs=False, requires_pediatric_first_aid=False, medical_notes=None, harness=None,
                   safeguarding_notes='', parent2_name='', parent2_phone=''):
@@ -634,22 +748,33 @@ def delete_student(student_id):
         return True
     return False
 
+def _move_student_to_route(student_id, route_id):
+    """Point a student at a route, keeping both routes' student_ids in sync.
+    
+    Both ids must exist. Returns False when the student was already assigned.
+    """
+    old_route_id = students[student_id].get('route_id')
+    if old_route_id == route_id and student_id in routes[route_id]['student_ids']:
+        return False
+    
+    # Remove from previous route if assigned
+    if old_route_id and old_route_id in routes:
+        if student_id in routes[old_route_id]['student_ids']:
+            routes[old_route_id]['student_ids'].remove(student_id)
+    
+    # Assign to new route
+    students[student_id]['route_id'] = route_id
+    if student_id not in routes[route_id]['student_ids']:
+        routes[route_id]['student_ids'].append(student_id)
+    return True
+
 def assign_student_to_route(student_id, route_id):
     """Assign a student to a route"""
     print(f"DEBUG: Attempting to assign student {student_id} to route {route_id}")
     print(f"DEBUG: Student exists: {student_id in students}, Route exists: {route_id in routes}")
     
     if student_id in students and route_id in routes:
-        # Remove from previous route if assigned
-        old_route_id = students[student_id].get('route_id')
-        if old_route_id and old_route_id in routes:
-            if student_id in routes[old_route_id]['student_ids']:
-                routes[old_route_id]['student_ids'].remove(student_id)
-        
-        # Assign to new route
-        students[student_id]['route_id'] = route_id
-        if student_id not in routes[route_id]['student_ids']:
-            routes[route_id]['student_ids'].append(student_id)
+        _move_student_to_route(student_id, route_id)
         
         print(f"DEBUG: Successfully assigned student {student_id} ({students[student_id]['name']}) to route {route_id}")
         save_data_to_file()  # Save data immediately after assignment
@@ -658,6 +783,33 @@ def assign_student_to_route(student_id, route_id):
     print(f"DEBUG: Failed to assign student {student_id} to route {route_id}")
     return False
 
+def assign_students_bulk(assignments, validate=True):
+    """Assign students to routes from (student_id, route_id) pairs, saving once at the end.
+    
+    With validate=True, unknown ids are found up front with set operations and
+    those pairs are skipped; pass validate=False when every id is known to come
+    from the store. Returns the number of students whose assignment changed.
+    """
+    assignments = list(assignments)
+    if validate:
+        unknown_students = {student_id for student_id, _ in assignments} - students.keys()
+        unknown_routes = {route_id for _, route_id in assignments} - routes.keys()
+        if unknown_students or unknown_routes:
+            print(f"DEBUG: Skipping assignments for unknown students {sorted(unknown_students)} "
+                  f"and routes {sorted(unknown_routes)}")
+            assignments = [(student_id, route_id) for student_id, route_id in assignments
+                           if student_id not in unknown_students and route_id not in unknown_routes]
+    
+    assigned = 0
+    for student_id, route_id in assignments:
+        # Already assigned pairs change nothing and are not counted
+        if _move_student_to_route(student_id, route_id):
+            assigned += 1
+    
+    if assigned:
+        save_data_to_file()
+    return assigned
+
 def remove_student_from_route(student_id):
     """Remove a student from their current route"""
     if student_id in students:
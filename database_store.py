@@ -4,8 +4,11 @@ This module provides CRUD operations using PostgreSQL for persistent storage.
 """
 
 from app import db
-from models import School, Route, Student, Provider, Area, Staff
-from datetime import datetime
+from models import School, Route, Student, Provider, Area, Staff, StaffAccount, StateVersion, STATE_VERSION_ID, bump_session_state_version
+from sqlalchemy import exists, func, insert, or_, select, update, lambda_stmt
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import joinedload
+from collections import namedtuple
 import uuid
 import logging
 import io
@@ -15,10 +18,31 @@ import csv
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Statements for the hot read paths, built once so their compiled form
+# stays in SQLAlchemy's statement cache
+_ALL_SCHOOLS_STMT = select(School)
+_ALL_ROUTES_STMT = select(Route)
+_ALL_STUDENTS_STMT = select(Student)
+_ALL_PROVIDERS_STMT = select(Provider).order_by(Provider.name)
+_ALL_AREAS_STMT = select(Area)
+_ALL_STAFF_STMT = select(Staff)
+
+# Monotonic counter bumped with every write (see models.StateVersion)
+_STATE_VERSION_STMT = select(StateVersion.version).where(StateVersion.id == STATE_VERSION_ID)
+
+def get_state_version():
+    """Get a token that changes whenever any data changes"""
+    return db.session.scalar(_STATE_VERSION_STMT) or 0
+
+def bump_state_version():
+    """Mark data as changed for writes the session events can't see
+    (bulk_*_mappings, COPY, raw SQL); commits with the current transaction"""
+    bump_session_state_version(db.session)
+
 # Database operations for schools
 def get_all_schools():
     """Get all schools as dictionary"""
-    schools = School.query.all()
+    schools = db.session.scalars(_ALL_SCHOOLS_STMT)
     return {school.id: {
         'id': school.id,
         'name': school.name,
@@ -49,7 +73,6 @@ def update_school(school_id, **updates):
         for key, value in updates.items():
             if hasattr(school, key):
                 setattr(school, key, value)
-        school.updated_at = datetime.now()
         db.session.commit()
         logger.info(f"Updated school {school_id}")
         return True
@@ -66,10 +89,9 @@ def delete_school(school_id):
     return False
 
 # Database operations for routes
-def get_all_routes():
-    """Get all routes as dictionary"""
-    routes = Route.query.all()
-    return {route.id: {
+def _route_to_dict(route):
+    """Convert a Route row to its dictionary form"""
+    return {
         'id': route.id,
         'route_number': route.route_number,
         'status': route.status,
@@ -77,12 +99,34 @@ def get_all_routes():
         'provider_id': route.provider_id,
         'max_capacity': route.max_capacity,
         'hidden_from_admin': getattr(route, 'hidden_from_admin', False)
-    } for route in routes}
+    }
+
+def get_all_routes():
+    """Get all routes as dictionary"""
+    routes = db.session.scalars(_ALL_ROUTES_STMT)
+    return {route.id: _route_to_dict(route) for route in routes}
+
+def get_all_routes_with_area_names():
+    """Get all routes as dictionary, each including its area's name"""
+    stmt = select(Route, Area.name).outerjoin(Area, Route.area_id == Area.id)
+    routes = {}
+    for route, area_name in db.session.execute(stmt):
+        route_dict = _route_to_dict(route)
+        route_dict['area_name'] = area_name
+        routes[route.id] = route_dict
+    return routes
+
+def route_number_exists(route_number, exclude_route_id=None):
+    """Check case-insensitively whether a route already uses this number"""
+    condition = func.lower(Route.route_number) == route_number.lower()
+    if exclude_route_id:
+        condition = condition & (Route.id != exclude_route_id)
+    return db.session.query(exists().where(condition)).scalar()
 
 def get_route(route_id):
     """Get a single route"""
-    routes = get_all_routes()
-    return routes.get(route_id)
+    route = db.session.get(Route, route_id) if route_id else None
+    return _route_to_dict(route) if route else None
 
 def create_route(route_number, area_id=None, provider_id=None, max_capacity=50, hidden_from_admin=False):
     """Create a new route"""
@@ -108,7 +152,6 @@ def update_route(route_id, **updates):
         for key, value in updates.items():
             if hasattr(route, key):
                 setattr(route, key, value)
-        route.updated_at = datetime.now()
         db.session.commit()
         logger.info(f"Updated route {route_id}: {updates}")
         return True
@@ -129,10 +172,9 @@ def delete_route(route_id):
     return False
 
 # Database operations for students
-def get_all_students():
-    """Get all students as dictionary"""
-    students = Student.query.all()
-    return {student.id: {
+def _student_to_dict(student):
+    """Convert a Student row to its dictionary form"""
+    return {
         'id': student.id,
         'name': student.name,
         'class': student.class_name,
@@ -152,36 +194,73 @@ def get_all_students():
         'requires_pediatric_first_aid': student.badge_required or '',  # Template compatibility
         'medical_notes': '',  # Medical notes not implemented in database yet
         'safeguarding_notes': student.safeguarding_notes or ''
-    } for student in students}
+    }
+
+def get_all_students():
+    """Get all students as dictionary"""
+    students = db.session.scalars(_ALL_STUDENTS_STMT)
+    return {student.id: _student_to_dict(student) for student in students}
+
+def iter_all_students(batch_size=500):
+    """Yield every student as a dictionary, fetching rows in batches.
+    
+    Prefer this over get_all_students() when the caller only iterates.
+    """
+    stmt = _ALL_STUDENTS_STMT.execution_options(yield_per=batch_size)
+    for student in db.session.scalars(stmt):
+        yield _student_to_dict(student)
 
 def get_student(student_id):
     """Get a single student"""
-    students = get_all_students()
-    return students.get(student_id)
+    student = db.session.get(Student, student_id) if student_id else None
+    return _student_to_dict(student) if student else None
+
+def _new_student_row(name, class_name='', **kwargs):
+    """Build the column values for a new student"""
+    return {
+        'id': str(uuid.uuid4()),
+        'name': name,
+        'class_name': class_name,
+        'route_id': kwargs.get('route_id'),
+        'school_id': kwargs.get('school_id'),
+        'parent1_name': kwargs.get('parent1_name', ''),
+        'parent1_phone': kwargs.get('parent1_phone', ''),
+        'parent2_name': kwargs.get('parent2_name', ''),
+        'parent2_phone': kwargs.get('parent2_phone', ''),
+        'address': kwargs.get('address', ''),
+        'medical_needs': kwargs.get('medical_needs', ''),
+        'harness_required': kwargs.get('harness_required', ''),
+        'badge_required': kwargs.get('badge_required', ''),
+        'safeguarding_notes': kwargs.get('safeguarding_notes', '')
+    }
 
 def create_student(name, class_name='', **kwargs):
     """Create a new student"""
-    student_id = str(uuid.uuid4())
-    student = Student(
-        id=student_id,
-        name=name,
-        class_name=class_name,
-        route_id=kwargs.get('route_id'),
-        school_id=kwargs.get('school_id'),
-        parent1_name=kwargs.get('parent1_name', ''),
-        parent1_phone=kwargs.get('parent1_phone', ''),
-        parent2_name=kwargs.get('parent2_name', ''),
-        parent2_phone=kwargs.get('parent2_phone', ''),
-        address=kwargs.get('address', ''),
-        medical_needs=kwargs.get('medical_needs', ''),
-        harness_required=kwargs.get('harness_required', ''),
-        badge_required=kwargs.get('badge_required', ''),
-        safeguarding_notes=kwargs.get('safeguarding_notes', '')
-    )
+    row = _new_student_row(name, class_name, **kwargs)
+    student = Student(**row)
     db.session.add(student)
     db.session.commit()
-    logger.info(f"Created student: {name} ({student_id})")
-    return student_id
+    logger.info(f"Created student: {name} ({row['id']})")
+    return row['id']
+
+def _insert_students(records):
+    """Insert students with one multi-row INSERT, without committing"""
+    rows = [_new_student_row(**record) for record in records]
+    if rows:
+        db.session.execute(insert(Student), rows)
+    return [row['id'] for row in rows]
+
+def create_students_bulk(records):
+    """Create many students with one multi-row INSERT.
+    
+    Each record holds the same keyword arguments as create_student.
+    Returns the new student ids in input order.
+    """
+    student_ids = _insert_students(records)
+    if student_ids:
+        db.session.commit()
+        logger.info(f"Created {len(student_ids)} students in bulk")
+    return student_ids
 
 def update_student(student_id, **updates):
     """Update student information"""
@@ -202,7 +281,6 @@ def update_student(student_id, **updates):
         for key, value in updates.items():
             if hasattr(student, key):
                 setattr(student, key, value)
-        student.updated_at = datetime.now()
         db.session.commit()
         logger.info(f"Updated student {student_id}")
         return True
@@ -219,21 +297,25 @@ def delete_student(student_id):
     return False
 
 # Database operations for providers
-def get_all_providers():
-    """Get all providers as dictionary ordered by name"""
-    providers = Provider.query.order_by(Provider.name).all()
-    return {provider.id: {
+def _provider_to_dict(provider):
+    """Convert a Provider row to its dictionary form"""
+    return {
         'id': provider.id,
         'name': provider.name,
         'contact_name': provider.contact_name or '',
         'phone': provider.phone or '',
         'email': provider.email or ''
-    } for provider in providers}
+    }
+
+def get_all_providers():
+    """Get all providers as dictionary ordered by name"""
+    providers = db.session.scalars(_ALL_PROVIDERS_STMT)
+    return {provider.id: _provider_to_dict(provider) for provider in providers}
 
 def get_provider(provider_id):
     """Get a single provider"""
-    providers = get_all_providers()
-    return providers.get(provider_id)
+    provider = db.session.get(Provider, provider_id) if provider_id else None
+    return _provider_to_dict(provider) if provider else None
 
 def create_provider(name, contact_name='', phone='', email=''):
     """Create a new provider"""
@@ -272,7 +354,7 @@ def update_provider(provider_id, name=None, contact_name=None, phone=None, email
             provider.email = email
         db.session.commit()
         logger.info(f"Updated provider {provider_id}")
-        return get_provider(provider_id)
+        return _provider_to_dict(provider)
     return None
 
 def delete_provider(provider_id):
@@ -286,25 +368,47 @@ def delete_provider(provider_id):
     return False
 
 # Database operations for areas
-def get_all_areas():
-    """Get all areas as dictionary"""
-    areas = Area.query.all()
-    return {area.id: {
+def _area_to_dict(area):
+    """Convert an Area row to its dictionary form"""
+    return {
         'id': area.id,
         'name': area.name,
         'description': area.description or ''
-    } for area in areas}
+    }
+
+def get_all_areas():
+    """Get all areas as dictionary"""
+    areas = db.session.scalars(_ALL_AREAS_STMT)
+    return {area.id: _area_to_dict(area) for area in areas}
 
 def get_area(area_id):
     """Get a single area"""
-    areas = get_all_areas()
-    return areas.get(area_id)
+    area = db.session.get(Area, area_id) if area_id else None
+    return _area_to_dict(area) if area else None
 
 def get_routes_by_area(area_id):
     """Get all routes for a specific area"""
-    routes_data = get_all_routes()
-    return {route_id: route_data for route_id, route_data in routes_data.items() 
-            if route_data.get('area_id') == area_id}
+    stmt = lambda_stmt(lambda: select(Route).where(Route.area_id == area_id))
+    return {route.id: _route_to_dict(route) for route in db.session.scalars(stmt)}
+
+def get_visible_routes_for_class(class_name, excluded_area_name='Multiple areas'):
+    """Get the routes a class's students ride, skipping routes in the excluded area.
+    
+    Returns (routes, student_count) where student_count is the number of
+    the class's students on those routes.
+    """
+    stmt = (select(Route, func.count(Student.id))
+            .join(Student, Student.route_id == Route.id)
+            .outerjoin(Area, Route.area_id == Area.id)
+            .where(Student.class_name == class_name,
+                   or_(Area.id.is_(None), Area.name != excluded_area_name))
+            .group_by(Route.id))
+    routes = {}
+    student_count = 0
+    for route, count in db.session.execute(stmt):
+        routes[route.id] = _route_to_dict(route)
+        student_count += count
+    return routes, student_count
 
 def create_area(name, school_id=None, description=''):
     """Create a new area"""
@@ -326,16 +430,19 @@ def update_area(area_id, **updates):
         for key, value in updates.items():
             if hasattr(area, key):
                 setattr(area, key, value)
-        area.updated_at = datetime.now()
         db.session.commit()
         logger.info(f"Updated area {area_id}")
         return True
     return False
 
+def area_has_routes(area_id):
+    """Check if any route is assigned to an area"""
+    return db.session.query(exists().where(Route.area_id == area_id)).scalar()
+
 def delete_area(area_id):
-    """Delete an area"""
+    """Delete an area, refusing while routes are still assigned to it"""
     area = Area.query.get(area_id)
-    if area:
+    if area and not area_has_routes(area_id):
         db.session.delete(area)
         db.session.commit()
         logger.info(f"Deleted area {area_id}")
@@ -344,14 +451,17 @@ def delete_area(area_id):
 
 # Database operations for staff
 def get_all_staff():
-    """Get all staff as dictionary"""
-    staff_list = Staff.query.all()
+    """Get all staff as dictionary, flagging those with a login account"""
+    account_ids = set(db.session.scalars(select(StaffAccount.staff_id)))
+    staff_list = db.session.scalars(_ALL_STAFF_STMT)
     return {staff.id: {
         'id': staff.id,
+        'name': staff.display_name or staff.username,
         'username': staff.username,
         'display_name': staff.display_name or staff.username,
         'account_type': staff.account_type,
-        'is_active': staff.is_active
+        'is_active': staff.is_active,
+        'has_account': staff.id in account_ids
     } for staff in staff_list}
 
 def create_staff(username, account_type='class', display_name=None):
@@ -369,18 +479,15 @@ def create_staff(username, account_type='class', display_name=None):
     logger.info(f"Created staff: {username} ({staff_id})")
     return staff_id
 
-def update_staff(staff_id, **updates):
-    """Update staff information"""
-    staff = Staff.query.get(staff_id)
-    if staff:
-        for key, value in updates.items():
-            if hasattr(staff, key):
-                setattr(staff, key, value)
-        staff.updated_at = datetime.now()
-        db.session.commit()
-        logger.info(f"Updated staff {staff_id}")
-        return True
-    return False
+def get_staff_and_classes(user_id):
+    """Get a user's StaffAccount and assigned class names in one query"""
+    staff_account = (db.session.query(StaffAccount)
+                     .options(joinedload(StaffAccount.class_assignments))
+                     .filter(StaffAccount.user_id == user_id)
+                     .first())
+    if not staff_account:
+        return None, []
+    return staff_account, [a.class_name for a in staff_account.class_assignments]
 
 def get_staff_account(username):
     """Get staff account by username"""
@@ -396,33 +503,43 @@ def get_staff_account(username):
         }
     return None
 
-def process_students_csv(csv_content):
-    """Process a CSV file with students data"""
+# Number of parsed CSV rows held in memory before they are inserted
+CSV_BATCH_SIZE = 500
+
+def process_students_csv(csv_file):
+    """Process a CSV file with students data
+    
+    csv_file is a text stream (e.g. the upload wrapped in io.TextIOWrapper),
+    read row by row and inserted in batches of CSV_BATCH_SIZE. The whole
+    import is one transaction: a database error rolls back every batch.
+    """
     results = {
         'success': [],
         'errors': []
     }
     
     try:
-        # Parse CSV content
-        csv_reader = csv.DictReader(io.StringIO(csv_content))
+        # Parse CSV rows straight from the stream
+        csv_reader = csv.reader(csv_file)
+        header = [col.strip() for col in next(csv_reader, [])]
+        batch = []
         
         # Check if required columns exist
         required_columns = ['Name', 'Class', 'Parent/Carer Name', 'Parent/Carer Phone', 'Address']
         
         # Check for Class column (now required)
-        if 'Class' not in csv_reader.fieldnames:
+        if 'Class' not in header:
             results['errors'].append('Missing required columns. Expected: Name, Class, Parent/Carer Name, Parent/Carer Phone, Address')
             return results
         
         # Validate all required columns exist (support both old and new formats)
         missing_columns = []
         for col in required_columns:
-            if col not in csv_reader.fieldnames:
+            if col not in header:
                 # Check for backward compatibility
-                if col == 'Parent/Carer Name' and 'Parent Name' in csv_reader.fieldnames:
+                if col == 'Parent/Carer Name' and 'Parent Name' in header:
                     continue
-                elif col == 'Parent/Carer Phone' and 'Parent Phone' in csv_reader.fieldnames:
+                elif col == 'Parent/Carer Phone' and 'Parent Phone' in header:
                     continue
                 else:
                     missing_columns.append(col)
@@ -431,40 +548,63 @@ def process_students_csv(csv_content):
             results['errors'].append(f'Missing required columns: {", ".join(missing_columns)}. Expected: Name, Class, Parent/Carer Name, Parent/Carer Phone, Address')
             return results
         
+        # Resolve column positions once so rows can be read by index
+        idx = {}
+        for i, col in enumerate(header):
+            idx.setdefault(col, i)
+        name_i = idx['Name']
+        class_i = idx['Class']
+        address_i = idx['Address']
+        parent_i = idx.get('Parent/Carer Name', idx.get('Parent Name'))
+        phone_i = idx.get('Parent/Carer Phone', idx.get('Parent Phone'))
+        parent2_i = idx.get('Parent/Carer 2 Name')
+        phone2_i = idx.get('Parent/Carer 2 Phone')
+        medical_i = idx.get('Has Medical Needs')
+        harness_i = idx.get('Harness')
+        first_aid_i = idx.get('Requires Pediatric First Aid')
+        medical_notes_i = idx.get('Medical Notes')
+        safeguarding_i = idx.get('Safeguarding Notes')
+        width = len(header)
+        
         for row_num, row in enumerate(csv_reader, start=2):  # Start at 2 because header is row 1
+            if not row:
+                continue
             try:
+                # Pad short rows so missing trailing cells read as empty
+                if len(row) < width:
+                    row += [''] * (width - len(row))
+                
                 # Extract required fields
-                name = row['Name'].strip()
-                class_name = row['Class'].strip()
+                name = row[name_i].strip()
+                class_name = row[class_i].strip()
                 
                 # Clean class name: Remove "Class " prefix if present to prevent duplicates
                 if class_name.lower().startswith('class '):
                     class_name = class_name[6:].strip()  # Remove "Class " (6 characters)
                 
-                # Support both old and new column names for backward compatibility
-                parent_name = row.get('Parent/Carer Name', row.get('Parent Name', '')).strip()
-                parent_phone = row.get('Parent/Carer Phone', row.get('Parent Phone', '')).strip()
+                parent_name = row[parent_i].strip()
+                parent_phone = row[phone_i].strip()
                 
                 # Extract optional Parent 2 contact details
-                parent2_name = row.get('Parent/Carer 2 Name', '').strip()
-                parent2_phone = row.get('Parent/Carer 2 Phone', '').strip()
+                parent2_name = row[parent2_i].strip() if parent2_i is not None else ''
+                parent2_phone = row[phone2_i].strip() if phone2_i is not None else ''
                 
-                address = row['Address'].strip()
+                address = row[address_i].strip()
                 
                 # Optional fields
-                medical_needs = row.get('Has Medical Needs', 'No').strip()
-                harness_required = row.get('Harness', 'No').strip()
-                pediatric_first_aid = row.get('Requires Pediatric First Aid', 'No').strip()
-                medical_notes = row.get('Medical Notes', '').strip()
-                safeguarding_notes = row.get('Safeguarding Notes', '').strip()
+                medical_needs = row[medical_i].strip() if medical_i is not None else 'No'
+                harness_required = row[harness_i].strip() if harness_i is not None else 'No'
+                pediatric_first_aid = row[first_aid_i].strip() if first_aid_i is not None else 'No'
+                medical_notes = row[medical_notes_i].strip() if medical_notes_i is not None else ''
+                safeguarding_notes = row[safeguarding_i].strip() if safeguarding_i is not None else ''
                 
                 # Validate required fields
                 if not all([name, class_name, parent_name, parent_phone, address]):
                     results['errors'].append(f'Row {row_num}: Missing required fields (Name, Class, Parent/Carer Name, Parent/Carer Phone, Address)')
                     continue
                 
-                # Create student using create_student function
-                student_id = create_student(
+                # Queue student for the next batch insert
+                batch.append(dict(
                     name=name,
                     class_name=class_name,
                     parent1_name=parent_name,
@@ -477,7 +617,7 @@ def process_students_csv(csv_content):
                     pediatric_first_aid=pediatric_first_aid,
                     medical_notes=medical_notes,
                     safeguarding_notes=safeguarding_notes
-                )
+                ))
                 
                 results['success'].append(f'Added student: {name} (Class {class_name})')
                 logger.info(f"CSV: Created student {name} in class {class_name}")
@@ -485,8 +625,23 @@ def process_students_csv(csv_content):
             except Exception as e:
                 results['errors'].append(f'Row {row_num}: Error processing row - {str(e)}')
                 logger.error(f"CSV row {row_num} error: {e}")
-                
+            
+            if len(batch) >= CSV_BATCH_SIZE:
+                _insert_students(batch)
+                batch = []
+        
+        if batch:
+            _insert_students(batch)
+        db.session.commit()
+    
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        results['success'] = []
+        results['errors'].append(f'Error saving students, no rows were imported: {str(e)}')
+        logger.error(f"CSV import rolled back: {e}")
     except Exception as e:
+        db.session.rollback()
+        results['success'] = []
         results['errors'].append(f'Error reading CSV file: {str(e)}')
         logger.error(f"CSV processing error: {e}")
     
@@ -507,36 +662,120 @@ BUS_STATUS_NOT_PRESENT = 'not_present'
 BUS_STATUS_ARRIVED = 'arrived'
 BUS_STATUS_READY = 'ready'
 
+# Display text and CSS class for each route status
+ROUTE_STATUS_TEXTS = {
+    BUS_STATUS_NOT_PRESENT: 'Not Present',
+    BUS_STATUS_ARRIVED: 'Arrived',
+    BUS_STATUS_READY: 'Ready'
+}
+
+ROUTE_STATUS_CLASSES = {
+    BUS_STATUS_NOT_PRESENT: 'btn-danger',
+    BUS_STATUS_ARRIVED: 'btn-warning',
+    BUS_STATUS_READY: 'btn-success'
+}
+
 # Utility functions
 def get_route_status_text(status):
     """Get the text for a route status"""
-    status_texts = {
-        BUS_STATUS_NOT_PRESENT: 'Not Present',
-        BUS_STATUS_ARRIVED: 'Arrived',
-        BUS_STATUS_READY: 'Ready'
-    }
-    return status_texts.get(status, 'Unknown')
+    return ROUTE_STATUS_TEXTS.get(status, 'Unknown')
 
 def get_route_status_class(status):
     """Get CSS class for route status"""
-    status_classes = {
-        BUS_STATUS_NOT_PRESENT: 'btn-danger',
-        BUS_STATUS_ARRIVED: 'btn-warning',
-        BUS_STATUS_READY: 'btn-success'
-    }
-    return status_classes.get(status, 'btn-secondary')
+    return ROUTE_STATUS_CLASSES.get(status, 'btn-secondary')
 
 # Global flag to force database mode - CRITICAL FIX
 USE_DATABASE = True
 
+# Aggregate counts for the dashboard stats endpoint
+def count_schools():
+    """Count all schools"""
+    return db.session.scalar(select(func.count()).select_from(School))
+
+def count_staff():
+    """Count all staff members"""
+    return db.session.scalar(select(func.count()).select_from(Staff))
+
+def count_students(class_name=None):
+    """Count students, optionally only those in one class"""
+    stmt = select(func.count()).select_from(Student)
+    if class_name is not None:
+        stmt = stmt.where(Student.class_name == class_name)
+    return db.session.scalar(stmt)
+
+def count_students_by_route():
+    """Count assigned students per route, as {route_id: count}"""
+    rows = db.session.execute(select(Student.route_id, func.count())
+                              .where(Student.route_id.isnot(None))
+                              .group_by(Student.route_id))
+    return {route_id: count for route_id, count in rows}
+
+def count_routes_by_status():
+    """Count routes grouped by status, as {status: count}"""
+    rows = db.session.execute(select(Route.status, func.count()).group_by(Route.status))
+    return {status: count for status, count in rows}
+
+# Lightweight per-route summary for the dashboard status lists
+EnrichedRoute = namedtuple('EnrichedRoute', 'id route_number provider_name area_name status student_count')
+
+def compute_route_status_summary(routes):
+    """Group routes by status in one pass.
+    
+    Returns (ready_list, arrived_list, not_ready_list, ready_count,
+    arrived_count, not_ready_count) where each list holds EnrichedRoute tuples.
+    """
+    lists = {
+        BUS_STATUS_READY: [],
+        BUS_STATUS_ARRIVED: [],
+        BUS_STATUS_NOT_PRESENT: [],
+    }
+    for route_id, route in routes.items():
+        bucket = lists.get(route['status'])
+        if bucket is None:
+            continue
+        bucket.append(EnrichedRoute(
+            route_id,
+            route['route_number'],
+            route.get('provider_name', 'Unknown Provider'),
+            route.get('area_name', 'Unknown Area'),
+            route['status'],
+            len(route['student_ids']) if 'student_ids' in route else 0
+        ))
+    ready = lists[BUS_STATUS_READY]
+    arrived = lists[BUS_STATUS_ARRIVED]
+    not_ready = lists[BUS_STATUS_NOT_PRESENT]
+    return ready, arrived, not_ready, len(ready), len(arrived), len(not_ready)
+
 def get_route_status_color(status):
     """Get color for route status (alias for get_route_status_class)"""
     return get_route_status_class(status)
 
+def get_students_by_class(class_name):
+    """Get all students in a specific class"""
+    stmt = lambda_stmt(lambda: select(Student).where(Student.class_name == class_name))
+    return {student.id: _student_to_dict(student) for student in db.session.scalars(stmt)}
+
 def get_students_for_route(route_id):
     """Get all students assigned to a specific route"""
-    students = get_all_students()
-    return {s_id: student for s_id, student in students.items() if student.get('route_id') == route_id}
+    stmt = lambda_stmt(lambda: select(Student).where(Student.route_id == route_id))
+    return {student.id: _student_to_dict(student) for student in db.session.scalars(stmt)}
+
+def get_parent_route_students(provider_id):
+    """Get students on a provider's individual parent routes ("<name>'s Parent").
+    
+    Each student dict gets pickup_area_id set to the area of the individual
+    route the student is assigned to.
+    """
+    stmt = lambda_stmt(lambda: select(Student, Route.area_id)
+                       .join(Route, Student.route_id == Route.id)
+                       .where(Route.provider_id == provider_id,
+                              Route.route_number.endswith("'s Parent")))
+    students = {}
+    for student, area_id in db.session.execute(stmt):
+        student_dict = _student_to_dict(student)
+        student_dict['pickup_area_id'] = area_id
+        students[student.id] = student_dict
+    return students
 
 def assign_student_to_route(student_id, route_id):
     """Assign a student to a route"""
@@ -548,8 +787,7 @@ def unassign_student_from_route(student_id):
 
 def get_available_students():
     """Get students not assigned to any route"""
-    students = get_all_students()
-    return {s_id: student for s_id, student in students.items() if not student.get('route_id')}
+    return {student['id']: student for student in iter_all_students() if not student.get('route_id')}
 
 def get_route_student_count(route_id):
     """Get count of students assigned to a route"""
@@ -558,34 +796,42 @@ def get_route_student_count(route_id):
 
 def is_route_empty(route_id):
     """Check if a route has no students"""
-    return get_route_student_count(route_id) == 0
+    return not db.session.query(exists().where(Student.route_id == route_id)).scalar()
 
 def get_routes_by_status(status):
     """Get all routes with specific status"""
-    routes = get_all_routes()
-    return {r_id: route for r_id, route in routes.items() if route.get('status') == status}
+    stmt = lambda_stmt(lambda: select(Route).where(Route.status == status))
+    return {route.id: _route_to_dict(route) for route in db.session.scalars(stmt)}
+
+# (state version, sorted class names) from the last DISTINCT query; the shared
+# state version keeps this correct across worker processes
+_class_names_cache = (None, ())
 
 def get_unique_class_names():
     """Get list of unique class names from all students"""
-    students = get_all_students()
-    class_names = set()
-    for student in students.values():
-        if student.get('class'):
-            class_names.add(student['class'])
-    return sorted(list(class_names))
-
-def get_all_staff():
-    """Get all staff members from both data store and database"""
-    # For now, return empty dict since we're using database staff accounts
-    # This maintains compatibility with existing code
-    return {}
+    global _class_names_cache
+    # Read the version before the names, so a concurrent write can only make
+    # the cached entry look older than it is, never newer
+    state_version = get_state_version()
+    cached_version, class_names = _class_names_cache
+    if cached_version != state_version:
+        rows = (db.session.query(Student.class_name)
+                .filter(Student.class_name.isnot(None), Student.class_name != '')
+                .distinct()
+                .order_by(Student.class_name)
+                .all())
+        class_names = tuple(row[0] for row in rows)
+        _class_names_cache = (state_version, class_names)
+    return list(class_names)
 
 def get_staff(staff_id):
     """Get a specific staff member"""
     # Check if it's a StaffAccount in database
     try:
         from models import StaffAccount
-        staff_account = StaffAccount.query.filter_by(staff_id=staff_id).first()
+        staff_account = (StaffAccount.query
+                         .options(joinedload(StaffAccount.user))
+                         .filter_by(staff_id=staff_id).first())
         if staff_account and staff_account.user:
             return {
                 'id': staff_id,
@@ -607,7 +853,9 @@ def delete_staff_account(staff_id):
         from app import db
         
         # Find the staff account
-        staff_account = StaffAccount.query.filter_by(staff_id=staff_id).first()
+        staff_account = (StaffAccount.query
+                         .options(joinedload(StaffAccount.user))
+                         .filter_by(staff_id=staff_id).first())
         if not staff_account:
             logger.warning(f"Staff account {staff_id} not found")
             return False
@@ -619,8 +867,11 @@ def delete_staff_account(staff_id):
         from models import StaffClassAssignment
         StaffClassAssignment.query.filter_by(staff_account_id=staff_account.id).delete()
         
-        # Delete the staff account
+        # Delete the staff account and its display name record
         db.session.delete(staff_account)
+        staff = db.session.get(Staff, staff_id)
+        if staff:
+            db.session.delete(staff)
         
         # Delete the user account if it exists
         if user:
@@ -636,25 +887,35 @@ def delete_staff_account(staff_id):
         return False
 
 def update_staff(staff_id, **kwargs):
-    """Update a staff member"""
+    """Update a staff member and their login account"""
     try:
         from models import StaffAccount, User
         from app import db
         
-        staff_account = StaffAccount.query.filter_by(staff_id=staff_id).first()
-        if not staff_account:
+        staff = db.session.get(Staff, staff_id)
+        staff_account = (StaffAccount.query
+                         .options(joinedload(StaffAccount.user))
+                         .filter_by(staff_id=staff_id).first())
+        if not staff and not staff_account:
             return False
             
+        # Update staff record fields
+        if staff:
+            for key in ('username', 'display_name', 'account_type', 'is_active'):
+                if key in kwargs:
+                    setattr(staff, key, kwargs[key])
+        
         # Update staff account fields
-        if 'account_type' in kwargs:
-            staff_account.account_type = kwargs['account_type']
-            
-        # Update user fields if user exists
-        if staff_account.user:
-            if 'username' in kwargs:
-                staff_account.user.username = kwargs['username']
-            if 'password' in kwargs and kwargs['password']:
-                staff_account.user.set_password(kwargs['password'])
+        if staff_account:
+            if 'account_type' in kwargs:
+                staff_account.account_type = kwargs['account_type']
+                
+            # Update user fields if user exists
+            if staff_account.user:
+                if 'username' in kwargs:
+                    staff_account.user.username = kwargs['username']
+                if 'password' in kwargs and kwargs['password']:
+                    staff_account.user.set_password(kwargs['password'])
                 
         db.session.commit()
         logger.info(f"Updated staff {staff_id}")
@@ -666,12 +927,13 @@ def update_staff(staff_id, **kwargs):
         return False
 
 def bulk_update_route_status(route_ids, status):
-    """Update status for multiple routes"""
-    success_count = 0
-    for route_id in route_ids:
-        if update_route_status(route_id, status):
-            success_count += 1
-    return success_count
+    """Update status for multiple routes in a single UPDATE"""
+    if not route_ids:
+        return 0
+    result = db.session.execute(update(Route).where(Route.id.in_(route_ids)).values(status=status))
+    db.session.commit()
+    logger.info(f"Updated {result.rowcount} routes to status {status}")
+    return result.rowcount
 
 def get_route_capacity_info(route_id):
     """Get route capacity information"""
@@ -699,10 +961,8 @@ def initialize_data():
     logger.info("Database-backed data store initialized")
 
 # CSV processing functions - these need to be implemented if used
-def create_routes_csv_template():
-    """Create a CSV template for routes"""
-    import io
-    import csv
+def _build_routes_csv_template():
+    """Build the CSV template for routes"""
     output = io.StringIO()
     writer = csv.writer(output)
     writer.writerow(['route_number', 'provider_name', 'provider_contact', 'provider_phone', 'area_name', 'students'])
@@ -710,24 +970,41 @@ def create_routes_csv_template():
     writer.writerow(['59', 'Sandwell', 'Marcus Jackson', '965.669.4883x115', 'Secondary', ''])
     return output.getvalue()
 
-def process_routes_csv(csv_content):
-    """Process CSV content and create routes"""
-    import csv
-    import io
+# Template content is constant, so build it once at import
+_ROUTES_CSV_TEMPLATE = _build_routes_csv_template()
+
+def create_routes_csv_template():
+    """Create a CSV template for routes"""
+    return _ROUTES_CSV_TEMPLATE
+
+def process_routes_csv(csv_file):
+    """Process routes CSV and create routes
     
+    csv_file may be a text stream (read row by row) or the CSV as a string.
+    """
     results = {'success': [], 'errors': []}
     
     try:
-        # Parse the CSV content
-        csv_reader = csv.DictReader(io.StringIO(csv_content))
+        # Parse the CSV rows as they are read
+        if isinstance(csv_file, str):
+            csv_file = io.StringIO(csv_file)
+        csv_reader = csv.DictReader(csv_file)
         
-        # Get the default school
-        schools = get_all_schools()
-        if not schools:
+        # Make sure a school exists before importing routes
+        if db.session.query(School.id).first() is None:
             results['errors'].append('No school found. Please create a school first.')
             return results
-            
-        default_school_id = list(schools.keys())[0]
+        
+        # Look up existing areas and providers once by lowercase name,
+        # keeping the first match for duplicate names
+        areas_by_name = {}
+        for area in Area.query.all():
+            areas_by_name.setdefault(area.name.lower(), area.id)
+        providers_by_name = {}
+        for provider in Provider.query.all():
+            providers_by_name.setdefault(provider.name.lower(), provider.id)
+        
+        route_rows = []
         
         for row_num, row in enumerate(csv_reader, start=2):  # Start at 2 because header is row 1
             try:
@@ -737,7 +1014,6 @@ def process_routes_csv(csv_content):
                 provider_name = row.get('provider_name', '').strip()
                 provider_contact = row.get('provider_contact', '').strip()
                 provider_phone = row.get('provider_phone', '').strip()
-                students = row.get('students', '').strip()
                 
                 if not route_number:
                     results['errors'].append(f'Row {row_num}: route_number is required')
@@ -746,62 +1022,64 @@ def process_routes_csv(csv_content):
                 # Create or get area
                 area_id = None
                 if area_name:
-                    # Check if area already exists
-                    areas = get_all_areas()
-                    existing_area = None
-                    for aid, area_data in areas.items():
-                        if area_data['name'].lower() == area_name.lower():
-                            existing_area = aid
-                            break
-                    
-                    if existing_area:
-                        area_id = existing_area
-                    else:
-                        area_id = create_area(area_name, default_school_id)
+                    area_id = areas_by_name.get(area_name.lower())
+                    if area_id is None:
+                        area_id = str(uuid.uuid4())
+                        db.session.add(Area(id=area_id, name=area_name, description=''))
+                        areas_by_name[area_name.lower()] = area_id
+                        logger.info(f"CSV: Created area {area_name} ({area_id})")
                 
                 # Create or get provider
                 provider_id = None
                 if provider_name:
-                    # Check if provider already exists
-                    providers = get_all_providers()
-                    existing_provider = None
-                    for pid, provider_data in providers.items():
-                        if provider_data['name'].lower() == provider_name.lower():
-                            existing_provider = pid
-                            break
-                    
-                    if existing_provider:
-                        provider_id = existing_provider
-                    else:
+                    provider_id = providers_by_name.get(provider_name.lower())
+                    if provider_id is None:
                         # Create new provider with contact details
-                        provider_data = create_provider(
+                        provider_id = str(uuid.uuid4())
+                        db.session.add(Provider(
+                            id=provider_id,
                             name=provider_name,
                             contact_name=provider_contact or provider_name,
-                            phone=provider_phone or ''
-                        )
-                        provider_id = provider_data['id']
+                            phone=provider_phone or '',
+                            email=''
+                        ))
+                        providers_by_name[provider_name.lower()] = provider_id
+                        logger.info(f"CSV: Created provider {provider_name} ({provider_id})")
                 
-                # Create the route (default max_capacity to 50)
-                route_id = create_route(
-                    route_number=route_number,
-                    area_id=area_id,
-                    provider_id=provider_id,
-                    max_capacity=50
-                )
+                # Queue the route (default max_capacity to 50)
+                route_rows.append({
+                    'id': str(uuid.uuid4()),
+                    'route_number': route_number,
+                    'status': 'not_present',
+                    'area_id': area_id,
+                    'provider_id': provider_id,
+                    'max_capacity': 50,
+                    'hidden_from_admin': False
+                })
                 
                 results['success'].append(f'Created route: {route_number}')
                 
             except Exception as e:
                 results['errors'].append(f'Row {row_num}: Error processing route - {str(e)}')
                 continue
+        
+        if route_rows:
+            # Areas and providers must be written before routes reference them
+            db.session.flush()
+            db.session.bulk_insert_mappings(Route, route_rows)
+            bump_state_version()
+        db.session.commit()
+        logger.info(f"CSV: Created {len(route_rows)} routes")
                 
     except Exception as e:
+        db.session.rollback()
+        results['success'] = []
         results['errors'].append(f'Error parsing CSV: {str(e)}')
     
     return results
 
-def create_students_csv_template():
-    """Create a CSV template for students"""
+def _build_students_csv_template():
+    """Build the CSV template for students"""
     output = io.StringIO()
     writer = csv.writer(output)
     
@@ -814,6 +1092,12 @@ def create_students_csv_template():
     
     return output.getvalue()
 
+_STUDENTS_CSV_TEMPLATE = _build_students_csv_template()
+
+def create_students_csv_template():
+    """Create a CSV template for students"""
+    return _STUDENTS_CSV_TEMPLATE
+
 # Compatibility functions to maintain existing API
 def save_data_to_file():
     """No-op for compatibility - data is automatically saved to database"""
@@ -9,6 +9,8 @@ sys.path.append('.')
 
 from app import app, db
 from models import Route, Student, Area
+from sqlalchemy import func
+from sqlalchemy.orm import raiseload, selectinload
 import database_store as data_store
 import uuid
 import logging
@@ -19,59 +21,60 @@ def fix_consolidated_parent_routes():
     """Fix consolidated parent routes by creating individual routes"""
     
     with app.app_context():
-        # Find problematic consolidated parent routes
-        consolidated_routes = {}
-        all_routes = Route.query.all()
-        all_students = Student.query.all()
+        # Let the database find consolidated parent routes: more than one
+        # student on the route and the students have different first names
+        rows = (db.session.query(Route.id, Route.route_number, Route.status,
+                                 Route.area_id, Route.provider_id,
+                                 func.array_agg(Student.id).label('student_ids'),
+                                 func.array_agg(Student.name).label('names'))
+                .join(Student, Student.route_id == Route.id)
+                .filter(Route.route_number.like('%Parent%'), Route.route_number != 'Parent')
+                .group_by(Route.id, Route.route_number, Route.status, Route.area_id, Route.provider_id)
+                .having(func.count(func.split_part(Student.name, ' ', 1).distinct()) > 1)
+                .all())
         
-        # Group students by route to identify consolidated routes
-        for route in all_routes:
-            if 'Parent' in route.route_number and route.route_number != 'Parent':
-                # Get students on this route
-                route_students = [s for s in all_students if s.route_id == route.id]
-                
-                if len(route_students) > 1:
-                    # Check if students have different first names - this indicates consolidation problem
-                    first_names = [s.name.split()[0] for s in route_students]
-                    unique_first_names = set(first_names)
-                    
-                    if len(unique_first_names) > 1:
-                        logger.info(f"Found consolidated route: {route.route_number} with students: {[s.name for s in route_students]}")
-                        consolidated_routes[route.id] = {
-                            'route': route,
-                            'students': route_students,
-                            'first_names': first_names
-                        }
+        routes_by_id = {}
+        consolidated_routes = {}
+        for route_id, route_number, status, area_id, provider_id, student_ids, names in rows:
+            routes_by_id[route_id] = {
+                'route_number': route_number,
+                'status': status,
+                'area_id': area_id,
+                'provider_id': provider_id
+            }
+            logger.info(f"Found consolidated route: {route_number} with students: {names}")
+            consolidated_routes[route_id] = list(zip(student_ids, names))
         
-        # Fix each consolidated route
-        for route_id, route_info in consolidated_routes.items():
-            route = route_info['route']
-            students = route_info['students']
-            
-            logger.info(f"Fixing consolidated route: {route.route_number}")
+        # Build individual routes and student reassignments for each consolidated route
+        new_routes = []
+        student_updates = []
+        for route_id, students in consolidated_routes.items():
+            route = routes_by_id[route_id]
+            logger.info(f"Fixing consolidated route: {route['route_number']}")
             
-            # Create individual routes for each student
-            for student in students:
-                # Create new individual route
+            for student_id, student_name in students:
                 individual_route_id = str(uuid.uuid4())
-                individual_route = Route(
-                    id=individual_route_id,
-                    route_number=f"{student.name.split()[0]} {student.name.split()[1]}'s Parent",
-                    status=route.status,
-                    area_id=route.area_id,
-                    provider_id=route.provider_id,
-                    max_capacity=1
-                )
-                db.session.add(individual_route)
-                
-                # Assign student to new individual route
-                student.route_id = individual_route_id
-                
-                logger.info(f"Created individual route: {individual_route.route_number} for {student.name}")
-            
-            # Delete the old consolidated route
-            db.session.delete(route)
-            logger.info(f"Deleted consolidated route: {route.route_number}")
+                # First and last name only; single-word names are used as-is
+                route_number = f"{' '.join(student_name.split()[:2])}'s Parent"
+                new_routes.append({
+                    'id': individual_route_id,
+                    'route_number': route_number,
+                    'status': route['status'],
+                    'area_id': route['area_id'],
+                    'provider_id': route['provider_id'],
+                    'max_capacity': 1
+                })
+                student_updates.append({'id': student_id, 'route_id': individual_route_id})
+                logger.info(f"Created individual route: {route_number} for {student_name}")
+        
+        # Insert new routes, move students, then drop the old routes in one transaction
+        if consolidated_routes:
+            db.session.bulk_insert_mappings(Route, new_routes)
+            db.session.bulk_update_mappings(Student, student_updates)
+            data_store.bump_state_version()
+            db.session.execute(Route.__table__.delete().where(Route.id.in_(list(consolidated_routes))))
+            for route_id in consolidated_routes:
+                logger.info(f"Deleted consolidated route: {routes_by_id[route_id]['route_number']}")
         
         # Commit all changes
         db.session.commit()
@@ -79,17 +82,17 @@ def fix_consolidated_parent_routes():
         logger.info(f"Fixed {len(consolidated_routes)} consolidated parent routes")
         
         # Verify the fix
-        remaining_alice_routes = Route.query.filter(Route.route_number.like('%Alice%')).all()
-        remaining_edward_routes = Route.query.filter(Route.route_number.like('%Edward%')).all()
+        remaining_alice_routes = (Route.query.options(selectinload(Route.students), raiseload('*'))
+                                  .filter(Route.route_number.like('%Alice%')).all())
+        remaining_edward_routes = (Route.query.options(selectinload(Route.students), raiseload('*'))
+                                   .filter(Route.route_number.like('%Edward%')).all())
         
         logger.info("Verification after fix:")
         for route in remaining_alice_routes:
-            students_on_route = Student.query.filter_by(route_id=route.id).all()
-            logger.info(f"- {route.route_number}: {[s.name for s in students_on_route]}")
+            logger.info(f"- {route.route_number}: {[s.name for s in route.students]}")
             
         for route in remaining_edward_routes:
-            students_on_route = Student.query.filter_by(route_id=route.id).all()
-            logger.info(f"- {route.route_number}: {[s.name for s in students_on_route]}")
+            logger.info(f"- {route.route_number}: {[s.name for s in route.students]}")
 
 if __name__ == '__main__':
     fix_consolidated_parent_routes()
\ No newline at end of file
@@ -3,8 +3,29 @@
 Fix route data to ensure all routes have proper provider and area information
 """
 
+import uuid
+
 import data_store
 
+# Route-specific provider and area assignments based on uploaded CSV
+ROUTE_ASSIGNMENTS = {
+    '352': {'provider': 'SkyLine Travel', 'area': 'Dawdle'},
+    '59': {'provider': 'Sandwell', 'area': 'Secondary'},
+    '371': {'provider': 'SkyLine Travel', 'area': 'Secondary'},
+    '569': {'provider': 'Green Destination', 'area': 'Front of school'},
+    '238': {'provider': 'BrightPath Mobility', 'area': 'Secondary'},
+    '533': {'provider': 'Sandwell', 'area': 'Dawdle'},
+    '368': {'provider': 'BrightPath Mobility', 'area': 'Front of school'},
+    '270': {'provider': 'HATS', 'area': 'Dawdle'},
+    '938': {'provider': 'Sandwell', 'area': 'Secondary'},
+    '781': {'provider': 'HATS', 'area': 'Secondary'},
+    '240': {'provider': 'Green Destination', 'area': 'Dawdle'},
+    '207': {'provider': 'Green Destination', 'area': 'Front of school'},
+    '646': {'provider': 'Green Destination', 'area': 'Secondary'},
+    '159': {'provider': 'SkyLine Travel', 'area': 'Front of school'},
+    '703': {'provider': 'BrightPath Mobility', 'area': 'Dawdle'}
+}
+
 def fix_route_provider_area_data():
     """Fix missing provider and area data for routes"""
     routes = data_store.get_all_routes()
@@ -29,16 +50,17 @@ def fix_route_provider_area_data():
         'Front of school': 'Front of school'
     }
     
+    # Index providers and areas by name once (first match wins, as before)
+    providers_by_name = {}
+    for p_id, provider in providers.items():
+        providers_by_name.setdefault(provider.get('name'), p_id)
+    areas_by_name = {}
+    for a_id, area in areas.items():
+        areas_by_name.setdefault(area.get('name'), a_id)
+    
     # Ensure providers exist in the system
     for provider_name in provider_mapping.values():
-        provider_exists = False
-        for p_id, provider in providers.items():
-            if provider.get('name') == provider_name:
-                provider_exists = True
-                break
-        
-        if not provider_exists:
-            import uuid
+        if provider_name not in providers_by_name:
             new_provider_id = str(uuid.uuid4())
             providers[new_provider_id] = {
                 'id': new_provider_id,
@@ -46,66 +68,39 @@ def fix_route_provider_area_data():
                 'contact': f'Contact for {provider_name}',
                 'phone': '000-000-0000'
             }
+            providers_by_name[provider_name] = new_provider_id
             print(f"Created provider: {provider_name}")
     
     # Ensure areas exist in the system
     for area_name in area_mapping.values():
-        area_exists = False
-        for a_id, area in areas.items():
-            if area.get('name') == area_name:
-                area_exists = True
-                break
-        
-        if not area_exists:
-            import uuid
+        if area_name not in areas_by_name:
             new_area_id = str(uuid.uuid4())
             areas[new_area_id] = {
                 'id': new_area_id,
                 'name': area_name,
                 'description': f'{area_name} pickup/dropoff area'
             }
+            areas_by_name[area_name] = new_area_id
             print(f"Created area: {area_name}")
     
-    # Route-specific provider and area assignments based on uploaded CSV
-    route_assignments = {
-        '352': {'provider': 'SkyLine Travel', 'area': 'Dawdle'},
-        '59': {'provider': 'Sandwell', 'area': 'Secondary'},
-        '371': {'provider': 'SkyLine Travel', 'area': 'Secondary'},
-        '569': {'provider': 'Green Destination', 'area': 'Front of school'},
-        '238': {'provider': 'BrightPath Mobility', 'area': 'Secondary'},
-        '533': {'provider': 'Sandwell', 'area': 'Dawdle'},
-        '368': {'provider': 'BrightPath Mobility', 'area': 'Front of school'},
-        '270': {'provider': 'HATS', 'area': 'Dawdle'},
-        '938': {'provider': 'Sandwell', 'area': 'Secondary'},
-        '781': {'provider': 'HATS', 'area': 'Secondary'},
-        '240': {'provider': 'Green Destination', 'area': 'Dawdle'},
-        '207': {'provider': 'Green Destination', 'area': 'Front of school'},
-        '646': {'provider': 'Green Destination', 'area': 'Secondary'},
-        '159': {'provider': 'SkyLine Travel', 'area': 'Front of school'},
-        '703': {'provider': 'BrightPath Mobility', 'area': 'Dawdle'}
+    # Resolve every assignment to ids once, so the route loop is a single lookup
+    assignment_ids = {
+        route_number: (providers_by_name.get(assignment['provider']), areas_by_name.get(assignment['area']))
+        for route_number, assignment in ROUTE_ASSIGNMENTS.items()
     }
+    test_route_numbers = {'N1', 'S1', 'C1', 'E1', 'W1'}
+    hats_provider_id = providers_by_name.get('HATS')
+    secondary_area_id = areas_by_name.get('Secondary')
+    front_area_id = areas_by_name.get('Front of school')
     
     # Update routes with correct provider and area data
     updated_count = 0
     for route_id, route in routes.items():
         route_number = route.get('route_number')
         
-        if route_number in route_assignments:
-            assignment = route_assignments[route_number]
-            
-            # Find provider ID
-            provider_id = None
-            for p_id, provider in providers.items():
-                if provider.get('name') == assignment['provider']:
-                    provider_id = p_id
-                    break
-            
-            # Find area ID
-            area_id = None
-            for a_id, area in areas.items():
-                if area.get('name') == assignment['area']:
-                    area_id = a_id
-                    break
+        if route_number in ROUTE_ASSIGNMENTS:
+            assignment = ROUTE_ASSIGNMENTS[route_number]
+            provider_id, area_id = assignment_ids[route_number]
             
             if provider_id and area_id:
                 # Update route data
@@ -117,20 +112,10 @@ def fix_route_provider_area_data():
                 print(f"Updated Route {route_number}: {assignment['provider']} / {assignment['area']}")
         
         # Handle original test routes with default values
-        elif route_number in ['N1', 'S1', 'C1', 'E1', 'W1']:
+        elif route_number in test_route_numbers:
             # Assign default provider and area for test routes
-            default_provider_id = None
-            default_area_id = None
-            
-            for p_id, provider in providers.items():
-                if provider.get('name') == 'HATS':
-                    default_provider_id = p_id
-                    break
-            
-            for a_id, area in areas.items():
-                if area.get('name') == 'Secondary':
-                    default_area_id = a_id
-                    break
+            default_provider_id = hats_provider_id
+            default_area_id = secondary_area_id
             
             if default_provider_id and default_area_id:
                 route['provider_id'] = default_provider_id
@@ -142,18 +127,8 @@ def fix_route_provider_area_data():
         
         elif route_number == 'Parent':
             # Special handling for Parent route
-            default_provider_id = None
-            default_area_id = None
-            
-            for p_id, provider in providers.items():
-                if provider.get('name') == 'HATS':
-                    default_provider_id = p_id
-                    break
-            
-            for a_id, area in areas.items():
-                if area.get('name') == 'Front of school':
-                    default_area_id = a_id
-                    break
+            default_provider_id = hats_provider_id
+            default_area_id = front_area_id
             
             if default_provider_id and default_area_id:
                 route['provider_id'] = default_provider_id
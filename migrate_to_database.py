@@ -10,120 +10,155 @@ sys.path.append('.')
 
 from app import app, db
 from models import School, Route, Student, Provider, Area, Staff
+from sqlalchemy import text
+from sqlalchemy.orm import joinedload, raiseload
+from auto_migrate import ensure_column_defaults
 import data_store
+import database_store
+import csv
+import io
+from itertools import islice
 import uuid
 from datetime import datetime
 
+# Rows per INSERT/COPY batch; only one batch of row dicts is held at a time
+BATCH_SIZE = 1000
+
+def bulk_insert(model, rows):
+    """Insert row dicts from an iterable in batches, using COPY on PostgreSQL and
+    batched INSERTs elsewhere. Returns the number of rows inserted."""
+    use_copy = db.engine.dialect.name == 'postgresql'
+    rows = iter(rows)
+    count = 0
+    while True:
+        batch = list(islice(rows, BATCH_SIZE))
+        if not batch:
+            if count:
+                # Neither COPY nor bulk_insert_mappings goes through the session events
+                database_store.bump_state_version()
+            return count
+        if use_copy:
+            copy_rows(model, batch)
+        else:
+            db.session.bulk_insert_mappings(model, batch)
+        count += len(batch)
+
+def copy_rows(model, rows):
+    """Stream rows into the model's table with COPY inside the session transaction.
+    
+    Columns left out (created_at, updated_at) are filled by their server defaults.
+    """
+    columns = list(rows[0])
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        # \N marks NULL so it stays distinct from empty strings
+        writer.writerow(['\\N' if row[col] is None else row[col] for col in columns])
+    buffer.seek(0)
+    
+    cursor = db.session.connection().connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY {model.__tablename__} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv, NULL '\\N')",
+            buffer
+        )
+    finally:
+        cursor.close()
+
 def migrate_data():
     """Migrate all data from file storage to database"""
     
     with app.app_context():
         # Create all tables
         db.create_all()
+        ensure_column_defaults()
         
         print("Loading data from file storage...")
         data_store.load_data_from_file()
         
         # Clear existing database data to avoid conflicts
         print("Clearing existing database data...")
-        Staff.query.delete()
-        Student.query.delete()
-        Route.query.delete()
-        Provider.query.delete()
-        Area.query.delete()
-        School.query.delete()
+        if db.engine.dialect.name == 'postgresql':
+            tables = ', '.join(model.__tablename__ for model in (Staff, Student, Route, Provider, Area, School))
+            db.session.execute(text(f"TRUNCATE {tables} RESTART IDENTITY CASCADE"))
+            database_store.bump_state_version()
+        else:
+            for model in (Staff, Student, Route, Provider, Area, School):
+                model.query.delete()
         db.session.commit()
         
         # Migrate schools
         print("Migrating schools...")
-        school_count = 0
-        for school_id, school_data in data_store.schools.items():
-            school = School(
-                id=school_id,
-                name=school_data.get('name', ''),
-                address=school_data.get('address', ''),
-                phone=school_data.get('phone', ''),
-                email=school_data.get('email', '')
-            )
-            db.session.add(school)
-            school_count += 1
+        school_rows = ({
+            'id': school_id,
+            'name': school_data.get('name', ''),
+            'address': school_data.get('address', ''),
+            'phone': school_data.get('phone', ''),
+            'email': school_data.get('email', '')
+        } for school_id, school_data in data_store.schools.items())
+        school_count = bulk_insert(School, school_rows)
         
         # Migrate providers
         print("Migrating providers...")
-        provider_count = 0
-        for provider_id, provider_data in data_store.providers.items():
-            provider = Provider(
-                id=provider_id,
-                name=provider_data.get('name', ''),
-                contact_name=provider_data.get('contact_name', ''),
-                phone=provider_data.get('phone', ''),
-                email=provider_data.get('email', '')
-            )
-            db.session.add(provider)
-            provider_count += 1
+        provider_rows = ({
+            'id': provider_id,
+            'name': provider_data.get('name', ''),
+            'contact_name': provider_data.get('contact_name', ''),
+            'phone': provider_data.get('phone', ''),
+            'email': provider_data.get('email', '')
+        } for provider_id, provider_data in data_store.providers.items())
+        provider_count = bulk_insert(Provider, provider_rows)
         
         # Migrate areas
         print("Migrating areas...")
-        area_count = 0
-        for area_id, area_data in data_store.areas.items():
-            area = Area(
-                id=area_id,
-                name=area_data.get('name', ''),
-                description=area_data.get('description', '')
-            )
-            db.session.add(area)
-            area_count += 1
+        area_rows = ({
+            'id': area_id,
+            'name': area_data.get('name', ''),
+            'description': area_data.get('description', '')
+        } for area_id, area_data in data_store.areas.items())
+        area_count = bulk_insert(Area, area_rows)
         
         # Migrate routes
         print("Migrating routes...")
-        route_count = 0
-        for route_id, route_data in data_store.routes.items():
-            route = Route(
-                id=route_id,
-                route_number=route_data.get('route_number', ''),
-                status=route_data.get('status', 'not_present'),
-                area_id=route_data.get('area_id'),
-                provider_id=route_data.get('provider_id'),
-                max_capacity=route_data.get('max_capacity', 50)
-            )
-            db.session.add(route)
-            route_count += 1
+        route_rows = ({
+            'id': route_id,
+            'route_number': route_data.get('route_number', ''),
+            'status': route_data.get('status', 'not_present'),
+            'area_id': route_data.get('area_id'),
+            'provider_id': route_data.get('provider_id'),
+            'max_capacity': route_data.get('max_capacity', 50)
+        } for route_id, route_data in data_store.routes.items())
+        route_count = bulk_insert(Route, route_rows)
         
         # Migrate students
         print("Migrating students...")
-        student_count = 0
-        for student_id, student_data in data_store.students.items():
-            student = Student(
-                id=student_id,
-                name=student_data.get('name', ''),
-                class_name=student_data.get('class', ''),
-                route_id=student_data.get('route_id'),
-                school_id=student_data.get('school_id'),
-                parent1_name=student_data.get('parent1_name', ''),
-                parent1_phone=student_data.get('parent1_phone', ''),
-                parent2_name=student_data.get('parent2_name', ''),
-                parent2_phone=student_data.get('parent2_phone', ''),
-                medical_needs=student_data.get('medical_needs', ''),
-                harness_required=student_data.get('harness_required', ''),
-                badge_required=student_data.get('badge_required', ''),
-                safeguarding_notes=student_data.get('safeguarding_notes', '')
-            )
-            db.session.add(student)
-            student_count += 1
+        student_rows = ({
+            'id': student_id,
+            'name': student_data.get('name', ''),
+            'class_name': student_data.get('class', ''),
+            'route_id': student_data.get('route_id'),
+            'school_id': student_data.get('school_id'),
+            'parent1_name': student_data.get('parent1_name', ''),
+            'parent1_phone': student_data.get('parent1_phone', ''),
+            'parent2_name': student_data.get('parent2_name', ''),
+            'parent2_phone': student_data.get('parent2_phone', ''),
+            'medical_needs': student_data.get('medical_needs', ''),
+            'harness_required': student_data.get('harness_required', ''),
+            'badge_required': student_data.get('badge_required', ''),
+            'safeguarding_notes': student_data.get('safeguarding_notes', '')
+        } for student_id, student_data in data_store.students.items())
+        student_count = bulk_insert(Student, student_rows)
         
         # Migrate staff
         print("Migrating staff...")
-        staff_count = 0
-        for staff_id, staff_data in data_store.staff.items():
-            staff = Staff(
-                id=staff_id,
-                username=staff_data.get('username', ''),
-                display_name=staff_data.get('display_name', ''),
-                account_type=staff_data.get('account_type', 'class'),
-                is_active=staff_data.get('is_active', True)
-            )
-            db.session.add(staff)
-            staff_count += 1
+        staff_rows = ({
+            'id': staff_id,
+            'username': staff_data.get('username', ''),
+            'display_name': staff_data.get('display_name', ''),
+            'account_type': staff_data.get('account_type', 'class'),
+            'is_active': staff_data.get('is_active', True)
+        } for staff_id, staff_data in data_store.staff.items())
+        staff_count = bulk_insert(Staff, staff_rows)
         
         # Commit all changes
         print("Committing changes to database...")
@@ -148,11 +183,11 @@ All data is now stored persistently in PostgreSQL and will survive redeployments
         """)
         
         # Verify Alice students are properly separated
-        alice_students = Student.query.filter(Student.name.like('%Alice%')).all()
+        alice_students = (Student.query.options(joinedload(Student.route), raiseload('*'))
+                          .filter(Student.name.like('%Alice%')).all())
         print(f"\nAlice student verification:")
         for student in alice_students:
-            route = Route.query.get(student.route_id) if student.route_id else None
-            route_name = route.route_number if route else "No route"
+            route_name = student.route.route_number if student.route else "No route"
             print(f"- {student.name} -> {route_name}")
 
 if __name__ == '__main__':
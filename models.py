@@ -1,4 +1,6 @@
 from datetime import datetime
+from itertools import chain
+from sqlalchemy import event, func
 from werkzeug.security import generate_password_hash, check_password_hash
 
 from app import db
@@ -65,31 +67,38 @@ class School(db.Model):
     phone = db.Column(db.String)
     email = db.Column(db.String)
     
-    created_at = db.Column(db.DateTime, default=datetime.now)
-    updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
+    created_at = db.Column(db.DateTime, server_default=func.now())
+    updated_at = db.Column(db.DateTime, server_default=func.now(), onupdate=func.now())
 
 class Route(db.Model):
     __tablename__ = 'routes'
     id = db.Column(db.String, primary_key=True)  # UUID
-    route_number = db.Column(db.String, nullable=False)
-    status = db.Column(db.String, default='not_present')  # not_present, arrived, ready
-    area_id = db.Column(db.String, db.ForeignKey('areas.id'))
-    provider_id = db.Column(db.String, db.ForeignKey('providers.id'))
+    route_number = db.Column(db.String, nullable=False, index=True)
+    status = db.Column(db.String, default='not_present', index=True)  # not_present, arrived, ready
+    area_id = db.Column(db.String, db.ForeignKey('areas.id'), index=True)
+    provider_id = db.Column(db.String, db.ForeignKey('providers.id'), index=True)
     max_capacity = db.Column(db.Integer, default=50)
     hidden_from_admin = db.Column(db.Boolean, default=False)  # For individual parent routes
     
-    created_at = db.Column(db.DateTime, default=datetime.now)
-    updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
+    created_at = db.Column(db.DateTime, server_default=func.now())
+    updated_at = db.Column(db.DateTime, server_default=func.now(), onupdate=func.now())
     
     area = db.relationship('Area', backref='routes')
     provider = db.relationship('Provider', backref='routes')
+    
+    # Dashboards filter by status within an area; route admin checks for
+    # duplicate route numbers case-insensitively
+    __table_args__ = (
+        db.Index('ix_route_status_area', 'status', 'area_id'),
+        db.Index('ix_routes_route_number_lower', func.lower(route_number)),
+    )
 
 class Student(db.Model):
     __tablename__ = 'students'
     id = db.Column(db.String, primary_key=True)  # UUID
     name = db.Column(db.String, nullable=False)
-    class_name = db.Column(db.String)
-    route_id = db.Column(db.String, db.ForeignKey('routes.id'))
+    class_name = db.Column(db.String, index=True)
+    route_id = db.Column(db.String, db.ForeignKey('routes.id'), index=True)
     school_id = db.Column(db.String, db.ForeignKey('schools.id'))
     
     # Contact details
@@ -105,8 +114,8 @@ class Student(db.Model):
     badge_required = db.Column(db.String)
     safeguarding_notes = db.Column(db.Text)
     
-    created_at = db.Column(db.DateTime, default=datetime.now)
-    updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
+    created_at = db.Column(db.DateTime, server_default=func.now())
+    updated_at = db.Column(db.DateTime, server_default=func.now(), onupdate=func.now())
     
     route = db.relationship('Route', backref='students')
     school = db.relationship('School', backref='students')
@@ -119,8 +128,8 @@ class Provider(db.Model):
     phone = db.Column(db.String)
     email = db.Column(db.String)
     
-    created_at = db.Column(db.DateTime, default=datetime.now)
-    updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
+    created_at = db.Column(db.DateTime, server_default=func.now())
+    updated_at = db.Column(db.DateTime, server_default=func.now(), onupdate=func.now())
 
 class Area(db.Model):
     __tablename__ = 'areas'
@@ -128,16 +137,52 @@ class Area(db.Model):
     name = db.Column(db.String, nullable=False)
     description = db.Column(db.String)
     
-    created_at = db.Column(db.DateTime, default=datetime.now)
-    updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
+    created_at = db.Column(db.DateTime, server_default=func.now())
+    updated_at = db.Column(db.DateTime, server_default=func.now(), onupdate=func.now())
 
 class Staff(db.Model):
     __tablename__ = 'staff_data'
     id = db.Column(db.String, primary_key=True)  # UUID
-    username = db.Column(db.String, nullable=False)
+    username = db.Column(db.String, nullable=False, unique=True, index=True)
     display_name = db.Column(db.String)
     account_type = db.Column(db.String, nullable=False)  # admin or class
     is_active = db.Column(db.Boolean, default=True)
     
-    created_at = db.Column(db.DateTime, default=datetime.now)
-    updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
+    created_at = db.Column(db.DateTime, server_default=func.now())
+    updated_at = db.Column(db.DateTime, server_default=func.now(), onupdate=func.now())
+
+class StateVersion(db.Model):
+    """Single-row counter bumped in the same transaction as every data write"""
+    __tablename__ = 'state_version'
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+
+STATE_VERSION_ID = 1
+
+_BUMP_STATE_VERSION = (StateVersion.__table__.update()
+                       .where(StateVersion.__table__.c.id == STATE_VERSION_ID)
+                       .values(version=StateVersion.__table__.c.version + 1))
+
+def bump_session_state_version(session):
+    """Bump the state version inside the session's current transaction"""
+    # Runs on the session's connection, so it commits or rolls back with the
+    # write that caused it and readers never see a version ahead of the data.
+    # Executing it on the connection also keeps it out of do_orm_execute below.
+    session.connection().execute(_BUMP_STATE_VERSION)
+
+# Unit-of-work flushes and insert()/update()/delete() statements bump the
+# version automatically. Writes that bypass both events must call
+# database_store.bump_state_version() themselves: bulk_insert_mappings and
+# bulk_update_mappings, COPY through the DBAPI cursor, and raw text()
+# statements such as TRUNCATE.
+@event.listens_for(db.session, 'after_flush')
+def _bump_state_version_after_flush(session, flush_context):
+    if any(not isinstance(obj, StateVersion)
+           for obj in chain(session.new, session.dirty, session.deleted)):
+        bump_session_state_version(session)
+
+@event.listens_for(db.session, 'do_orm_execute')
+def _bump_state_version_on_statement(orm_execute_state):
+    # Bulk insert()/update()/delete() statements bypass the flush
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        bump_session_state_version(orm_execute_state.session)
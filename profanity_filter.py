@@ -3,6 +3,7 @@ Profanity filter module for Hamilton TMS
 Filters inappropriate content from user inputs
 """
 
+import functools
 import re
 
 # Focused list of clearly inappropriate words/phrases to filter
@@ -28,6 +29,52 @@ PROFANITY_LIST = [
     'f*ck', 'f**k', 'sh1t', 'fuk', 'shyt', 'f4ck', 'sh!t'
 ]
 
+# All words combined into one pattern, compiled once at import.
+# Word boundaries avoid false positives with names containing these words.
+_PROFANITY_RE = re.compile(r'\b(?:' + '|'.join(re.escape(word) for word in PROFANITY_LIST) + r')\b',
+                           re.IGNORECASE)
+
+# Cheap pre-check: clean text (the common case) contains none of these as plain
+# substrings, so the boundary-aware regex only runs on likely hits. Words that
+# contain another list word (e.g. 'fucking' contains 'fuck') are redundant here.
+_PROFANITY_SUBSTRINGS = tuple(word for word in PROFANITY_LIST
+                              if not any(other != word and other in word for other in PROFANITY_LIST))
+
+def _may_contain_profanity(text):
+    """Return False when text cannot match _PROFANITY_RE"""
+    text_lower = text.lower()
+    return any(word in text_lower for word in _PROFANITY_SUBSTRINGS)
+
+# Extra terms rejected in educational content; matched anywhere in the text
+# (e.g. 'discriminat' covers discriminate/discrimination)
+INAPPROPRIATE_EDUCATIONAL_LIST = [
+    'violent', 'violence', 'inappropriate', 'bullying', 'bully',
+    'harassment', 'discriminat', 'racist', 'sexist'
+]
+
+_INAPPROPRIATE_EDUCATIONAL_RE = re.compile('|'.join(re.escape(word) for word in INAPPROPRIATE_EDUCATIONAL_LIST),
+                                           re.IGNORECASE)
+
+# Form values (names, classes, route numbers) repeat across requests, so results
+# are cached per string. Only str values reach these helpers.
+@functools.lru_cache(maxsize=4096)
+def _find_profanity(text):
+    """Distinct profane words in text, in PROFANITY_LIST order"""
+    if not _may_contain_profanity(text):
+        return ()
+    matches = {match.lower() for match in _PROFANITY_RE.findall(text)}
+    return tuple(word for word in PROFANITY_LIST if word in matches)
+
+@functools.lru_cache(maxsize=4096)
+def _filter_profanity(text, replacement):
+    if not _may_contain_profanity(text):
+        return text
+    return _PROFANITY_RE.sub(replacement, text)
+
+@functools.lru_cache(maxsize=4096)
+def _has_inappropriate_educational(text):
+    return _INAPPROPRIATE_EDUCATIONAL_RE.search(text) is not None
+
 def contains_profanity(text):
     """
     Check if text contains profanity
@@ -37,17 +84,8 @@ def contains_profanity(text):
     if not text or not isinstance(text, str):
         return False, []
     
-    # Convert to lowercase for checking
-    text_lower = text.lower()
-    found_words = []
-    
-    # Check each word in profanity list
-    for word in PROFANITY_LIST:
-        # Use word boundaries to avoid false positives with names
-        # Only flag standalone words, not parts of legitimate words
-        pattern = r'\b' + re.escape(word) + r'\b'
-        if re.search(pattern, text_lower):
-            found_words.append(word)
+    # Report each distinct word once, in PROFANITY_LIST order
+    found_words = list(_find_profanity(text))
     
     return len(found_words) > 0, found_words
 
@@ -59,28 +97,15 @@ def filter_profanity(text, replacement="***"):
     if not text or not isinstance(text, str):
         return text
     
-    cleaned_text = text
-    
-    # Replace each profane word
-    for word in PROFANITY_LIST:
-        # Replace with word boundaries
-        pattern = r'\b' + re.escape(word) + r'\b'
-        cleaned_text = re.sub(pattern, replacement, cleaned_text, flags=re.IGNORECASE)
-    
-    return cleaned_text
+    return _filter_profanity(text, replacement)
 
 def validate_text_input(text, field_name="text"):
     """
     Validate text input for profanity
     Returns tuple (is_valid, error_message)
     """
-    has_profanity, found_words = contains_profanity(text)
-    
-    if has_profanity:
-        if len(found_words) == 1:
-            return False, f"The {field_name} contains inappropriate language. Please revise your input."
-        else:
-            return False, f"The {field_name} contains inappropriate language. Please revise your input."
+    if text and isinstance(text, str) and _find_profanity(text):
+        return False, f"The {field_name} contains inappropriate language. Please revise your input."
     
     return True, None
 
@@ -111,19 +136,34 @@ def validate_educational_content(text, field_name="content"):
         return is_valid, error_msg
     
     # Additional checks for educational inappropriate content
-    inappropriate_educational = [
-        'violent', 'violence', 'inappropriate', 'bullying', 'bully',
-        'harassment', 'discriminat', 'racist', 'sexist'
-    ]
+    if text and isinstance(text, str) and _has_inappropriate_educational(text):
+        return False, f"The {field_name} contains content that may be inappropriate for a school environment. Please revise your input."
     
-    text_lower = text.lower()
-    found_inappropriate = []
+    return True, None
+
+# Separates fields when several are scanned together; it is not a word
+# character, so neither pattern can match across two fields
+_FIELD_SEPARATOR = '\x1f'
+
+def validate_educational_batch(fields):
+    """
+    Validate several (text, field_name) pairs for a form at once
+    Returns tuple (is_valid, error_message) for the first field that fails,
+    as validate_educational_content would; pairs without text are skipped
+    """
+    fields = [(text, field_name) for text, field_name in fields
+              if text and field_name and isinstance(text, str)]
     
-    for word in inappropriate_educational:
-        if word in text_lower:
-            found_inappropriate.append(word)
+    # Clean forms (the common case) are settled with one scan of all fields
+    combined = _FIELD_SEPARATOR.join(text for text, _ in fields)
+    if not (_may_contain_profanity(combined) and _PROFANITY_RE.search(combined)) \
+            and not _INAPPROPRIATE_EDUCATIONAL_RE.search(combined):
+        return True, None
     
-    if found_inappropriate:
-        return False, f"The {field_name} contains content that may be inappropriate for a school environment. Please revise your input."
+    # Something matched, so check field by field to report the right one
+    for text, field_name in fields:
+        is_valid, error_msg = validate_educational_content(text, field_name)
+        if not is_valid:
+            return is_valid, error_msg
     
-    return True, None
\ No newline at end of file
+    return True, None
@@ -9,77 +9,104 @@ import sys
 sys.path.append('.')
 import data_store
 
+# Individual parent routes are named "<child's full name>'s Parent"
+PARENT_ROUTE_SUFFIX = "'s Parent"
+
+def ensure_child_routes(parent_route, child_route_numbers, existing_child_routes):
+    """Return ids for the given individual route numbers, creating missing ones.
+    
+    New routes copy the parent route's school, provider and area and are
+    created in one bulk call, hidden from Route Admin. Returns a
+    (route number -> route id) dict and the set of route numbers created.
+    """
+    to_create = [number for number in child_route_numbers if number not in existing_child_routes]
+    new_routes = data_store.create_routes_bulk([{
+        'school_id': parent_route['school_id'],
+        'route_number': child_route_number,
+        'provider_id': parent_route['provider_id'],
+        'area_id': parent_route['area_id'],
+        'extra_fields': {'hidden_from_admin': True}
+    } for child_route_number in to_create])
+    
+    route_ids = {number: existing_child_routes[number]
+                 for number in child_route_numbers if number in existing_child_routes}
+    route_ids.update((route['route_number'], route['id']) for route in new_routes)
+    return route_ids, set(to_create)
+
 def recreate_individual_parent_routes():
     """Create individual parent routes for each child assigned to parent pickup"""
     print("=== RECREATING INDIVIDUAL PARENT ROUTES FOR CHECK-IN ===")
     
     # Load current data
-    data_store.load_data_from_file()
+    data_store.load_data_from_file(sections=['routes', 'students'])
     
-    # Get all routes and students
+    # Get all routes
     routes = data_store.get_all_routes()
-    students = data_store.get_all_students()
     
     # Find the main Parent route
-    main_parent_route_id = None
-    main_parent_route = None
-    
-    for route_id, route in routes.items():
-        if route.get('route_number') == 'Parent':
-            main_parent_route_id = route_id
-            main_parent_route = route
-            break
+    main_parent_route = data_store.get_route_by_number('Parent')
+    main_parent_route_id = main_parent_route['id'] if main_parent_route else None
     
     if not main_parent_route_id:
         print("ERROR: Main Parent route not found!")
         return False
     
     # Find students assigned to the main Parent route
-    parent_students = [s for s in students.values() if s.get('route_id') == main_parent_route_id]
+    parent_students = data_store.get_students_by_route().get(main_parent_route_id, [])
     
     print(f"Found {len(parent_students)} students in main Parent route:")
-    for student in parent_students:
-        print(f"  - {student.get('name', 'Unknown')}")
+    if parent_students:
+        print("\n".join(f"  - {student.get('name', 'Unknown')}" for student in parent_students))
+    
+    main_provider_id = main_parent_route['provider_id']
     
-    # Create individual routes for each student
-    created_routes = 0
+    # Existing individual routes for this provider, by route number
+    existing_child_routes = {}
+    for route_id, route in routes.items():
+        route_number = route.get('route_number') or ''
+        if route.get('provider_id') == main_provider_id and route_number.endswith(PARENT_ROUTE_SUFFIX):
+            existing_child_routes.setdefault(route_number, route_id)
     
+    # Desired individual routes, one per child route number
+    # (use full name to completely avoid collisions)
+    desired_child_routes = {}
     for student in parent_students:
-        student_id = student.get('id')
-        student_name = student.get('name', 'Unknown')
-        # Use full name to completely avoid collisions
-        child_route_number = f"{student_name}'s Parent"
-        
-        # Check if individual route already exists
-        existing_route_id = None
-        for route_id, route in routes.items():
-            if (route.get('route_number') == child_route_number and 
-                route.get('provider_id') == main_parent_route['provider_id']):
-                existing_route_id = route_id
-                break
-        
-        if existing_route_id:
-            print(f"Individual route '{child_route_number}' already exists")
-            # Ensure student is assigned to individual route
-            data_store.assign_student_to_route(student_id, existing_route_id)
-            # Mark as hidden from admin but visible for check-in
-            individual_route = data_store.get_route(existing_route_id)
-            individual_route['hidden_from_admin'] = True
+        child_route_number = student.get('name', 'Unknown') + PARENT_ROUTE_SUFFIX
+        desired_child_routes.setdefault(child_route_number, []).append(student)
+    
+    # Make sure every desired route exists, then run one postlude for all of them
+    child_route_ids, created_numbers = ensure_child_routes(
+        main_parent_route, desired_child_routes, existing_child_routes)
+    created_routes = len(created_numbers)
+    
+    to_assign = []          # (student_id, route_id)
+    dirty = created_routes > 0  # whether anything needs writing back
+    messages = []           # progress lines, printed together at the end
+    
+    for child_route_number, route_students in desired_child_routes.items():
+        route_id = child_route_ids[child_route_number]
+        if child_route_number in created_numbers:
+            messages.append(f"Created individual route: {child_route_number}")
         else:
-            # Create new individual route
-            child_route = data_store.create_route(
-                school_id=main_parent_route['school_id'],
-                route_number=child_route_number,
-                provider_id=main_parent_route['provider_id'],
-                area_id=main_parent_route['area_id']
-            )
-            child_route['hidden_from_admin'] = True  # Mark as hidden from Route Admin
-            data_store.assign_student_to_route(student_id, child_route['id'])
-            print(f"Created individual route: {child_route_number}")
-            created_routes += 1
-    
-    # Save updated data
-    data_store.save_data_to_file()
+            messages.append(f"Individual route '{child_route_number}' already exists")
+        # Mark as hidden from admin but visible for check-in
+        individual_route = routes[route_id]
+        if individual_route.get('hidden_from_admin') is not True:
+            individual_route['hidden_from_admin'] = True
+            dirty = True
+        # Ensure students are assigned to individual route
+        for student in route_students:
+            if student.get('route_id') != route_id:
+                to_assign.append((student['id'], route_id))
+    
+    if messages:
+        print("\n".join(messages))
+    
+    # assign_students_bulk saves once if it assigned anything; otherwise save
+    # only when routes were created or flagged, so a no-op run writes nothing.
+    # Every id here was just read from the store, so skip re-validation.
+    if not data_store.assign_students_bulk(to_assign, validate=False) and dirty:
+        data_store.save_data_to_file()
     
     print(f"\n=== INDIVIDUAL ROUTE CREATION COMPLETE ===")
     print(f"Individual routes created: {created_routes}")
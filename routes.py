@@ -1,30 +1,53 @@
-from flask import render_template, request, redirect, url_for, flash, jsonify, session, make_response, Response
+from flask import render_template, request, redirect, url_for, flash, jsonify, session, make_response, Response, g
 from flask_login import login_user, logout_user, login_required, current_user
 from urllib.parse import urlparse
 from flask_wtf import FlaskForm
 from wtforms import StringField, PasswordField, SubmitField
 from wtforms.validators import InputRequired, Length
-from functools import wraps
+from functools import lru_cache, wraps
+from contextlib import contextmanager
+from sqlalchemy.exc import SQLAlchemyError
 from app import app, db, csrf
-from models import User
+from models import User, Staff, StaffAccount, StaffClassAssignment
 import database_store as data_store
 import profanity_filter
+import hashlib
+import hmac
+import io
 import json
+import logging
+import re
 import time
 import threading
 import uuid
 from collections import defaultdict
+from operator import itemgetter
 from datetime import datetime
 
 # Global event store for real-time updates
 event_clients = defaultdict(list)
 event_lock = threading.Lock()
 
+# Usernames that always have admin access
+_ADMIN_USERNAMES = tuple(name.encode('utf-8') for name in ('admin', 'gfokti', 'Gfokti'))
+
+def _is_admin_username(username):
+    """Check a username against the admin list in constant time"""
+    candidate = (username or '').encode('utf-8')
+    is_admin = False
+    for admin_username in _ADMIN_USERNAMES:
+        is_admin |= hmac.compare_digest(candidate, admin_username)
+    return is_admin
+
 def is_safe_url(target):
     """Check if a URL is safe for redirects (same host/internal only)"""
     if not target:
         return False
-    
+    return _is_safe_url_cached(target)
+
+@lru_cache(maxsize=1024)
+def _is_safe_url_cached(target):
+    """Cached body of is_safe_url for a non-empty target"""
     # Parse the target URL
     parsed = urlparse(target)
     
@@ -39,67 +62,92 @@ def is_safe_url(target):
     
     return True
 
+@contextmanager
+def _committing():
+    """Commit the session when the block succeeds, roll back and re-raise on a DB error"""
+    try:
+        yield db.session
+        db.session.commit()
+    except SQLAlchemyError:
+        db.session.rollback()
+        raise
+
 # Login Form
+_USERNAME_VALIDATORS = [InputRequired(), Length(min=3, max=20)]
+_PASSWORD_VALIDATORS = [InputRequired(), Length(min=6, max=40)]
+
 class LoginForm(FlaskForm):
-    username = StringField('Username', validators=[InputRequired(), Length(min=3, max=20)])
-    password = PasswordField('Password', validators=[InputRequired(), Length(min=6, max=40)])
+    username = StringField('Username', validators=_USERNAME_VALIDATORS)
+    password = PasswordField('Password', validators=_PASSWORD_VALIDATORS)
     submit = SubmitField('Sign In')
 
 
+def _current_staff_and_classes():
+    """Return current_user's StaffAccount and class names, looked up once per request"""
+    if 'staff_and_classes' not in g:
+        g.staff_and_classes = data_store.get_staff_and_classes(current_user.id)
+    return g.staff_and_classes
+
+def _current_staff_account():
+    """Return the StaffAccount for current_user"""
+    return _current_staff_and_classes()[0]
+
+def _current_assigned_classes():
+    """Return the class names assigned to current_user's staff account"""
+    return _current_staff_and_classes()[1]
+
+def is_admin_user():
+    """Check whether current_user is an admin by username or staff account, once per request"""
+    if 'is_admin' not in g:
+        is_admin = _is_admin_username(getattr(current_user, 'username', None))
+        if not is_admin:
+            try:
+                staff_account = _current_staff_account()
+                is_admin = staff_account is not None and staff_account.account_type == 'admin'
+            except Exception as e:
+                app.logger.warning("Error checking StaffAccount for admin status: %s", e)
+        g.is_admin = is_admin
+    return g.is_admin
+
+# How long a cached admin status in the session is trusted, in seconds
+ADMIN_STATUS_TTL = 300
 
 # Admin required decorator
 def admin_required(f):
     """Decorator to require admin privileges for route access"""
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        print(f"DEBUG ADMIN_DECORATOR: Checking access for route {f.__name__}")
-        print(f"DEBUG ADMIN_DECORATOR: User authenticated: {current_user.is_authenticated}")
-        print(f"DEBUG ADMIN_DECORATOR: Current user: {current_user.username if current_user.is_authenticated else 'None'}")
-        print(f"DEBUG ADMIN_DECORATOR: User ID: {current_user.id if current_user.is_authenticated else 'None'}")
+        if app.logger.isEnabledFor(logging.DEBUG):
+            app.logger.debug("ADMIN_DECORATOR: Checking access for route %s", f.__name__)
+            app.logger.debug("ADMIN_DECORATOR: User authenticated: %s", current_user.is_authenticated)
+            app.logger.debug("ADMIN_DECORATOR: Current user: %s", current_user.username if current_user.is_authenticated else 'None')
+            app.logger.debug("ADMIN_DECORATOR: User ID: %s", current_user.id if current_user.is_authenticated else 'None')
         
         if not current_user.is_authenticated:
-            print(f"DEBUG ADMIN_DECORATOR: User not authenticated, redirecting to login")
+            app.logger.debug("ADMIN_DECORATOR: User not authenticated, redirecting to login")
             return redirect(url_for('login'))
         
-        # Check admin status - simplified approach
-        is_admin = False
-        try:
-            # Direct username check first - most reliable
-            if hasattr(current_user, 'username') and current_user.username in ['admin', 'gfokti', 'Gfokti']:
-                is_admin = True
-                print(f"DEBUG ADMIN_DECORATOR: Admin access granted for username: {current_user.username}")
-            else:
-                # Check staff account as secondary method
-                try:
-                    from models import StaffAccount
-                    current_staff_account = StaffAccount.query.filter_by(user_id=current_user.id).first()
-                    print(f"DEBUG ADMIN_DECORATOR: StaffAccount found: {current_staff_account is not None}")
-                    if current_staff_account and current_staff_account.account_type == 'admin':
-                        is_admin = True
-                        print(f"DEBUG ADMIN_DECORATOR: Admin via StaffAccount")
-                except Exception as e:
-                    print(f"DEBUG ADMIN_DECORATOR: Error checking StaffAccount: {e}")
-        except Exception as e:
-            print(f"DEBUG ADMIN_DECORATOR: Error in admin check: {e}")
-            # Final fallback
-            is_admin = hasattr(current_user, 'username') and current_user.username in ['admin', 'gfokti', 'Gfokti']
+        # Reuse the admin status cached in the session until it goes stale
+        is_admin = session.get('is_admin')
+        checked_at = session.get('is_admin_checked_at', 0)
+        if is_admin is None or time.time() - checked_at > ADMIN_STATUS_TTL:
+            is_admin = is_admin_user()
+            session['is_admin'] = is_admin
+            session['is_admin_checked_at'] = time.time()
+        else:
+            app.logger.debug("ADMIN_DECORATOR: Using cached admin status")
         
-        print(f"DEBUG ADMIN_DECORATOR: Final admin status: {is_admin}")
+        app.logger.debug("ADMIN_DECORATOR: Final admin status: %s", is_admin)
         
         if not is_admin:
-            print(f"DEBUG ADMIN_DECORATOR: Access denied for user {current_user.username}")
+            app.logger.debug("ADMIN_DECORATOR: Access denied for user %s", current_user.username)
             flash('Access denied. Admin privileges required.', 'error')
             return redirect(url_for('index'))
         
-        print(f"DEBUG ADMIN_DECORATOR: Access granted, calling route {f.__name__}")
+        app.logger.debug("ADMIN_DECORATOR: Access granted, calling route %s", f.__name__)
         return f(*args, **kwargs)
     return decorated_function
 
-# Make session permanent
-@app.before_request
-def make_session_permanent():
-    session.permanent = True
-
 # Authentication Routes
 @app.route('/login', methods=['GET', 'POST'])
 def login():
@@ -109,25 +157,21 @@ def login():
     
     form = LoginForm()
     if form.validate_on_submit():
-        user = User.query.filter_by(username=form.username.data).first()
+        user = db.session.query(User).filter_by(username=form.username.data).first()
         
         if user and user.check_password(form.password.data) and user.active:
             login_user(user)
+            # Keep the login for PERMANENT_SESSION_LIFETIME rather than until the browser closes
+            session.permanent = True
+            
+            # Check if user is admin once and cache it for admin_required
+            session['is_admin'] = is_admin_user()
+            session['is_admin_checked_at'] = time.time()
+            
             next_page = request.args.get('next')
             if next_page and is_safe_url(next_page):
                 return redirect(next_page)
             else:
-                # Check if user is admin and redirect accordingly
-                is_admin = False
-                try:
-                    from models import StaffAccount
-                    staff_account = StaffAccount.query.filter_by(user_id=user.id).first()
-                    if user.username in ['admin', 'gfokti', 'Gfokti'] or (staff_account and staff_account.account_type == 'admin'):
-                        is_admin = True
-                except Exception as e:
-                    if user.username in ['admin', 'gfokti', 'Gfokti']:
-                        is_admin = True
-                
                 return redirect(url_for('routes'))
         else:
             flash('Invalid username or password')
@@ -141,6 +185,8 @@ def login():
 def logout():
     """User logout"""
     logout_user()
+    session.pop('is_admin', None)
+    session.pop('is_admin_checked_at', None)
     flash('You have been logged out')
     return redirect(url_for('login'))
 
@@ -161,17 +207,16 @@ def change_username():
         return redirect(url_for('profile'))
     
     # Check if username already exists
-    existing_user = User.query.filter_by(username=new_username).first()
+    existing_user = db.session.query(User).filter_by(username=new_username).first()
     if existing_user and existing_user.id != current_user.id:
         flash('Username already exists! Please choose a different username.', 'error')
         return redirect(url_for('profile'))
     
     try:
-        current_user.username = new_username
-        db.session.commit()
+        with _committing():
+            current_user.username = new_username
         flash('Username updated successfully!', 'success')
-    except Exception as e:
-        db.session.rollback()
+    except SQLAlchemyError as e:
         flash(f'Error updating username: {str(e)}', 'error')
     
     return redirect(url_for('profile'))
@@ -201,11 +246,10 @@ def change_password():
         return redirect(url_for('profile'))
     
     try:
-        current_user.set_password(new_password)
-        db.session.commit()
+        with _committing():
+            current_user.set_password(new_password)
         flash('Password updated successfully!', 'success')
-    except Exception as e:
-        db.session.rollback()
+    except SQLAlchemyError as e:
         flash(f'Error updating password: {str(e)}', 'error')
     
     return redirect(url_for('profile'))
@@ -217,7 +261,7 @@ def admin_change_user_password(user_id):
     # Temporarily allow all logged-in users
     print(f"DEBUG: Admin password change by {current_user.username} for user {user_id}")
     
-    target_user = User.query.get(user_id)
+    target_user = db.session.get(User, user_id)
     if not target_user:
         flash('User not found', 'error')
         return redirect(url_for('staff'))
@@ -228,11 +272,10 @@ def admin_change_user_password(user_id):
         return redirect(url_for('staff'))
     
     try:
-        target_user.set_password(new_password)
-        db.session.commit()
+        with _committing():
+            target_user.set_password(new_password)
         flash(f'Password updated for {target_user.username}', 'success')
-    except Exception as e:
-        db.session.rollback()
+    except SQLAlchemyError as e:
         flash(f'Error updating password: {str(e)}', 'error')
     
     return redirect(url_for('staff'))
@@ -244,7 +287,7 @@ def admin_change_user_username(user_id):
     # Temporarily allow all logged-in users  
     print(f"DEBUG: Admin username change by {current_user.username} for user {user_id}")
     
-    target_user = User.query.get(user_id)
+    target_user = db.session.get(User, user_id)
     if not target_user:
         flash('User not found', 'error')
         return redirect(url_for('staff'))
@@ -255,18 +298,17 @@ def admin_change_user_username(user_id):
         return redirect(url_for('staff'))
     
     # Check if username already exists
-    existing_user = User.query.filter_by(username=new_username).first()
+    existing_user = db.session.query(User).filter_by(username=new_username).first()
     if existing_user and existing_user.id != user_id:
         flash('Username already exists! Please choose a different username.', 'error')
         return redirect(url_for('staff'))
     
     try:
         old_username = target_user.username
-        target_user.username = new_username
-        db.session.commit()
+        with _committing():
+            target_user.username = new_username
         flash(f'Username updated from {old_username} to {new_username}', 'success')
-    except Exception as e:
-        db.session.rollback()
+    except SQLAlchemyError as e:
         flash(f'Error updating username: {str(e)}', 'error')
     
     return redirect(url_for('staff'))
@@ -277,20 +319,14 @@ def index():
     if current_user.is_authenticated:
         # Check account type and redirect accordingly
         try:
-            from models import StaffAccount
-            staff_account = StaffAccount.query.filter_by(user_id=current_user.id).first()
+            staff_account = _current_staff_account()
             
             # Check if class account
             if staff_account and staff_account.account_type == 'class':
                 return redirect(url_for('dashboard'))
             
-            # Check if admin account
-            is_admin = False
-            if current_user.username in ['admin', 'gfokti', 'Gfokti'] or (staff_account and staff_account.account_type == 'admin'):
-                is_admin = True
-            
             # Admin accounts go to routes (Transport Check-in)
-            if is_admin:
+            if is_admin_user():
                 return redirect(url_for('routes'))
             
             # Fallback for other users
@@ -298,7 +334,7 @@ def index():
             
         except Exception as e:
             # Fallback check for admin username
-            if current_user.username in ['admin', 'gfokti', 'Gfokti']:
+            if _is_admin_username(current_user.username):
                 return redirect(url_for('routes'))
             return redirect(url_for('dashboard'))
         
@@ -309,27 +345,9 @@ def index():
 def dashboard():
     """Main dashboard - for class accounts only. Admin accounts are redirected to Transport Check-in."""
     # Check if this is an admin account and redirect them
-    try:
-        from models import StaffAccount
-        staff_account = StaffAccount.query.filter_by(user_id=current_user.id).first()
-        
-        # Check if user is admin (either via username or staff account)
-        is_admin = False
-        if hasattr(current_user, 'username') and current_user.username in ['admin', 'gfokti', 'Gfokti']:
-            is_admin = True
-        elif staff_account and staff_account.account_type == 'admin':
-            is_admin = True
-            
-        if is_admin:
-            flash('Admin accounts should use Transport Check-in for route management.', 'info')
-            return redirect(url_for('routes'))
-            
-    except Exception as e:
-        print(f"Error checking admin status: {e}")
-        # Fallback check for admin username
-        if hasattr(current_user, 'username') and current_user.username in ['admin', 'gfokti', 'Gfokti']:
-            flash('Admin accounts should use Transport Check-in for route management.', 'info')
-            return redirect(url_for('routes'))
+    if is_admin_user():
+        flash('Admin accounts should use Transport Check-in for route management.', 'info')
+        return redirect(url_for('routes'))
     
     # Check if this is a class account
     is_class_account = False
@@ -337,14 +355,12 @@ def dashboard():
     selected_class = None
     
     try:
-        from models import StaffAccount, StaffClassAssignment
-        staff_account = StaffAccount.query.filter_by(user_id=current_user.id).first()
+        staff_account = _current_staff_account()
         
         if staff_account and staff_account.account_type == 'class':
             is_class_account = True
             # Get assigned classes for this staff member
-            assignments = StaffClassAssignment.query.filter_by(staff_account_id=staff_account.id).all()
-            assigned_classes = [a.class_name for a in assignments]
+            assigned_classes = _current_assigned_classes()
             
             # Auto-select class if user has only one class, or use first assigned class if none selected
             if len(assigned_classes) == 1:
@@ -367,13 +383,11 @@ def dashboard():
     # Get base data
     schools = data_store.get_all_schools()
     routes = data_store.get_all_routes()
-    students = data_store.get_all_students()
     
     # Filter data based on account type and selected class
     if is_class_account and selected_class:
         # For class accounts, filter to show only routes with students from the selected class
-        class_students = {sid: student for sid, student in students.items() 
-                         if student.get('class_name') == selected_class}
+        class_students = data_store.get_students_by_class(selected_class)
         
         # Get routes that have students from the selected class
         class_route_ids = set()
@@ -386,7 +400,7 @@ def dashboard():
         filtered_students = class_students
     else:
         # Admin view or no class selected - show all data
-        filtered_students = students
+        filtered_students = data_store.get_all_students()
         filtered_routes = routes
     
     # Calculate statistics based on filtered data
@@ -395,29 +409,8 @@ def dashboard():
     total_staff = len(data_store.get_all_staff())
     
     # Calculate route status counts and get route lists by status
-    ready_routes_list = []
-    arrived_routes_list = []
-    not_ready_routes_list = []
-    
-    for route_id, route in filtered_routes.items():
-        # Count students in this route
-        route_student_count = len(route.get('student_ids', []))
-        
-        enriched_route = {
-            'id': route_id,
-            'route_number': route['route_number'],
-            'provider_name': route.get('provider_name', 'Unknown Provider'),
-            'area_name': route.get('area_name', 'Unknown Area'),
-            'status': route['status'],
-            'student_count': route_student_count
-        }
-        
-        if route['status'] == data_store.BUS_STATUS_READY:
-            ready_routes_list.append(enriched_route)
-        elif route['status'] == data_store.BUS_STATUS_ARRIVED:
-            arrived_routes_list.append(enriched_route)
-        elif route['status'] == data_store.BUS_STATUS_NOT_PRESENT:
-            not_ready_routes_list.append(enriched_route)
+    (ready_routes_list, arrived_routes_list, not_ready_routes_list,
+     ready_routes, arrived_routes, not_ready_routes) = data_store.compute_route_status_summary(filtered_routes)
     
     # Get class names for dropdown - class accounts see only assigned classes
     if is_class_account:
@@ -431,9 +424,9 @@ def dashboard():
                          routes=filtered_routes,
                          total_schools=len(schools),
                          total_routes=total_routes,
-                         ready_routes=len(ready_routes_list),
-                         arrived_routes=len(arrived_routes_list),
-                         not_arrived_routes=len(not_ready_routes_list),
+                         ready_routes=ready_routes,
+                         arrived_routes=arrived_routes,
+                         not_arrived_routes=not_ready_routes,
                          ready_routes_list=ready_routes_list,
                          arrived_routes_list=arrived_routes_list,
                          not_arrived_routes_list=not_ready_routes_list,
@@ -443,6 +436,35 @@ def dashboard():
                          assigned_classes=assigned_classes,
                          selected_class=selected_class)
 
+def _state_etag(state_version, *parts):
+    """Build a weak ETag from the data version and request-specific parts"""
+    return 'W/"' + '-'.join(str(part) for part in (state_version,) + parts) + '"'
+
+def _with_etag(response, etag):
+    """Attach an ETag to a response and return it"""
+    response.headers['ETag'] = etag
+    return response
+
+def _page_etag(*parts):
+    """Build an ETag for a rendered page, or None if it must be rendered fresh.
+    
+    Rendered pages also carry the user's CSRF token, so the tag includes the
+    user, the session's token and the token's validity window. Pages with
+    pending flash messages are never tagged, so the messages are shown.
+    """
+    if session.get('_flashes'):
+        return None
+    csrf_window = app.config.get('WTF_CSRF_TIME_LIMIT', 3600)
+    csrf_bucket = int(time.time() // csrf_window) if csrf_window else 0
+    csrf_digest = hashlib.sha1(str(session.get('csrf_token', '')).encode('utf-8')).hexdigest()[:8]
+    return _state_etag(data_store.get_state_version(), current_user.id, csrf_digest, csrf_bucket, *parts)
+
+# Short-lived cache of dashboard_stats responses keyed by (resolved class, user id, data version)
+DASHBOARD_STATS_TTL = 5
+DASHBOARD_STATS_CACHE_SIZE = 1024
+_dashboard_stats_cache = {}
+_dashboard_stats_lock = threading.Lock()
+
 @app.route('/api/dashboard-stats')
 @login_required  
 def dashboard_stats():
@@ -452,181 +474,159 @@ def dashboard_stats():
     selected_class = request.args.get('class')
     assigned_classes = []
     
-    print(f"DEBUG DASHBOARD_STATS: User {current_user.username} (ID: {current_user.id})")
-    print(f"DEBUG DASHBOARD_STATS: Selected class from request: {selected_class}")
+    app.logger.debug("DASHBOARD_STATS: User %s (ID: %s)", current_user.username, current_user.id)
+    app.logger.debug("DASHBOARD_STATS: Selected class from request: %s", selected_class)
     
     try:
-        from models import StaffAccount, StaffClassAssignment
-        staff_account = StaffAccount.query.filter_by(user_id=current_user.id).first()
+        staff_account = _current_staff_account()
         
         if staff_account:
-            print(f"DEBUG DASHBOARD_STATS: Staff account found, type: {staff_account.account_type}")
+            app.logger.debug("DASHBOARD_STATS: Staff account found, type: %s", staff_account.account_type)
             if staff_account.account_type == 'class':
                 is_class_account = True
                 # Get assigned classes for this staff member
-                assignments = StaffClassAssignment.query.filter_by(staff_account_id=staff_account.id).all()
-                assigned_classes = [a.class_name for a in assignments]
-                print(f"DEBUG DASHBOARD_STATS: Assigned classes: {assigned_classes}")
+                assigned_classes = _current_assigned_classes()
+                app.logger.debug("DASHBOARD_STATS: Assigned classes: %s", assigned_classes)
                 
                 # Auto-select class if user has only one class, or use first assigned class if none selected
                 if len(assigned_classes) == 1:
                     selected_class = assigned_classes[0]
-                    print(f"DEBUG DASHBOARD_STATS: Auto-selected single class: {selected_class}")
+                    app.logger.debug("DASHBOARD_STATS: Auto-selected single class: %s", selected_class)
                 elif not selected_class and len(assigned_classes) > 0:
                     # For class accounts with multiple classes, default to first class if none selected
                     selected_class = assigned_classes[0]
-                    print(f"DEBUG DASHBOARD_STATS: Auto-selected first class: {selected_class}")
+                    app.logger.debug("DASHBOARD_STATS: Auto-selected first class: %s", selected_class)
                 elif selected_class and selected_class not in assigned_classes:
-                    print(f"DEBUG DASHBOARD_STATS: Selected class {selected_class} not in assigned classes, clearing")
+                    app.logger.debug("DASHBOARD_STATS: Selected class %s not in assigned classes, clearing", selected_class)
                     selected_class = None
         else:
-            print(f"DEBUG DASHBOARD_STATS: No staff account found")
+            app.logger.debug("DASHBOARD_STATS: No staff account found")
     except Exception as e:
-        print(f"Error checking staff account: {e}")
-    
-    print(f"DEBUG DASHBOARD_STATS: Final - is_class_account: {is_class_account}, selected_class: {selected_class}")
-    
-    # Get base data
-    schools = data_store.get_all_schools()
-    routes = data_store.get_all_routes()
-    students = data_store.get_all_students()
+        app.logger.warning("Error checking staff account: %s", e)
+    
+    app.logger.debug("DASHBOARD_STATS: Final - is_class_account: %s, selected_class: %s", is_class_account, selected_class)
+    
+    # Polling clients repeat identical requests: answer 304 when nothing has
+    # changed, and serve recent results for the same data version from cache.
+    # Both are keyed on the class resolved from the account's assignments, not
+    # the raw ?class= argument, so an assignment change is picked up.
+    state_version = data_store.get_state_version()
+    etag = _state_etag(state_version, current_user.id, selected_class or '*')
+    if request.headers.get('If-None-Match') == etag:
+        return Response(status=304, headers={'ETag': etag})
+    cache_key = (selected_class, current_user.id, state_version)
+    with _dashboard_stats_lock:
+        cached = _dashboard_stats_cache.get(cache_key)
+    if cached and time.time() - cached[0] < DASHBOARD_STATS_TTL:
+        return _with_etag(jsonify(cached[1]), etag)
     
     # Filter data based on selected class for both admin and class accounts
     if selected_class:
         if is_class_account:
-            print(f"DEBUG DASHBOARD_STATS: Filtering for class account with class {selected_class}")
+            app.logger.debug("DASHBOARD_STATS: Filtering for class account with class %s", selected_class)
         else:
-            print(f"DEBUG DASHBOARD_STATS: Filtering for admin account with selected class {selected_class}")
+            app.logger.debug("DASHBOARD_STATS: Filtering for admin account with selected class %s", selected_class)
         
-        # Filter to show only routes with students from the selected class
-        class_students = {sid: student for sid, student in students.items() 
-                         if student.get('class_name') == selected_class}
-        print(f"DEBUG DASHBOARD_STATS: Found {len(class_students)} students in class {selected_class}")
+        # Routes with students from the selected class, applying the same
+        # "Multiple areas" exclusion as Transport Check-in
+        filtered_routes, total_students = data_store.get_visible_routes_for_class(selected_class)
+        app.logger.debug("DASHBOARD_STATS: Found %s students on %s routes in class %s", total_students, len(filtered_routes), selected_class)
+        total_routes = len(filtered_routes)
         
-        # Get routes that have students from the selected class, applying same filtering as Transport Check-in
-        areas = data_store.get_all_areas()
-        class_route_ids = set()
-        filtered_class_students = {}
-        
-        for student_id, student in class_students.items():
-            route_id = student.get('route_id')
-            if route_id and route_id in routes:
-                route = routes[route_id]
-                # Apply same filtering as Transport Check-in: exclude routes in "Multiple areas"
-                area_id = route.get('area_id')
-                if area_id and area_id in areas:
-                    area = areas[area_id]
-                    if area.get('name') == 'Multiple areas':
-                        continue  # Skip routes in "Multiple areas"
-                
-                class_route_ids.add(route_id)
-                filtered_class_students[student_id] = student
-        filtered_routes = {rid: routes[rid] for rid in class_route_ids}
-        filtered_students = filtered_class_students
+        # Calculate route status counts
+        _, _, _, ready_routes, arrived_routes, not_ready_routes = data_store.compute_route_status_summary(filtered_routes)
     else:
-        print(f"DEBUG DASHBOARD_STATS: Showing all data (admin view or no class selected)")
-        # Admin view or no class selected - show all data
-        filtered_routes = routes
-        filtered_students = students
-    
-    total_routes = len(filtered_routes)
-    total_students = len(filtered_students)
-    total_staff = len(data_store.get_all_staff())
-    
-    # Calculate route status counts
-    ready_routes = 0
-    arrived_routes = 0
-    not_ready_routes = 0
-    
-    for route_id, route in filtered_routes.items():
-        if route['status'] == data_store.BUS_STATUS_READY:
-            ready_routes += 1
-        elif route['status'] == data_store.BUS_STATUS_ARRIVED:
-            arrived_routes += 1
-        elif route['status'] == data_store.BUS_STATUS_NOT_PRESENT:
-            not_ready_routes += 1
-    
-    return jsonify({
-        'total_schools': len(schools),
+        app.logger.debug("DASHBOARD_STATS: Showing all data (admin view or no class selected)")
+        # Admin view or no class selected - only counts are needed, so let the database do them
+        status_counts = data_store.count_routes_by_status()
+        total_routes = sum(status_counts.values())
+        ready_routes = status_counts.get(data_store.BUS_STATUS_READY, 0)
+        arrived_routes = status_counts.get(data_store.BUS_STATUS_ARRIVED, 0)
+        not_ready_routes = status_counts.get(data_store.BUS_STATUS_NOT_PRESENT, 0)
+        total_students = data_store.count_students()
+    
+    stats = {
+        'total_schools': data_store.count_schools(),
         'total_buses': total_routes,
         'ready_buses': ready_routes,
         'arrived_buses': arrived_routes, 
         'not_ready_buses': not_ready_routes,
-        'total_staff': total_staff,
+        'total_staff': data_store.count_staff(),
         'total_students': total_students
-    })
+    }
+    with _dashboard_stats_lock:
+        if len(_dashboard_stats_cache) >= DASHBOARD_STATS_CACHE_SIZE:
+            _dashboard_stats_cache.clear()
+        _dashboard_stats_cache[cache_key] = (time.time(), stats)
+    return _with_etag(jsonify(stats), etag)
 
 @app.route('/api/class-checkin/<class_name>')
 @login_required
 def get_class_checkin_data(class_name):
     """Get check-in data for students in a specific class, grouped by transport route"""
-    students = data_store.get_all_students()
-    routes = data_store.get_all_routes()
-    areas = data_store.get_all_areas()
+    etag = _state_etag(data_store.get_state_version(), class_name)
+    if request.headers.get('If-None-Match') == etag:
+        return Response(status=304, headers={'ETag': etag})
+    
+    students = data_store.get_students_by_class(class_name)
+    routes = data_store.get_all_routes_with_area_names()
     
     # Group students by route
     route_groups = {}
     no_route_students = []
     
-    # Filter students by class and group by route
+    # Group the class's students by route
     for student_id, student in students.items():
-        if student.get('class_name') == class_name:
-            route_id = student.get('route_id')
+        route_id = student.get('route_id')
+        
+        if route_id and route_id in routes:
+            # Student has a route assignment
+            route = routes[route_id]
             
-            if route_id and route_id in routes:
-                # Student has a route assignment
-                route = routes[route_id]
-                
-                # Check if route should be filtered out to match Transport Check-in logic
-                # The Transport Check-in page excludes routes in "Multiple areas"
-                area_id = route.get('area_id')
-                areas = data_store.get_all_areas()
-                if area_id and area_id in areas:
-                    area = areas[area_id]
-                    if area.get('name') == 'Multiple areas':
-                        continue  # Skip routes in "Multiple areas" to match Transport Check-in filtering
+            # Check if route should be filtered out to match Transport Check-in logic
+            # The Transport Check-in page excludes routes in "Multiple areas"
+            if route['area_name'] == 'Multiple areas':
+                continue  # Skip routes in "Multiple areas" to match Transport Check-in filtering
+            
+            route_key = route_id
+            
+            if route_key not in route_groups:
+                area_name = route['area_name'] or 'Unknown Area'
                 
-                route_key = route_id
+                # Determine check-in status based on route status
+                if route['status'] == data_store.BUS_STATUS_READY:
+                    checkin_status = 'Ready'
+                else:  # 'not_present' or 'arrived'
+                    checkin_status = 'Not Ready'
                 
-                if route_key not in route_groups:
-                    # Get area name
-                    area = areas.get(route.get('area_id'))
-                    area_name = area['name'] if area else 'Unknown Area'
-                    
-                    # Determine check-in status based on route status
-                    if route['status'] == data_store.BUS_STATUS_READY:
-                        checkin_status = 'Ready'
-                    else:  # 'not_present' or 'arrived'
-                        checkin_status = 'Not Ready'
-                    
-                    route_groups[route_key] = {
-                        'route_number': route['route_number'],
-                        'area': area_name,
-                        'checkin_status': checkin_status,
-                        'students': []
-                    }
-                
-                route_groups[route_key]['students'].append({
-                    'student_id': student_id,
-                    'name': student['name']
-                })
-            else:
-                # Student has no route assignment
-                no_route_students.append({
-                    'student_id': student_id,
-                    'name': student['name']
-                })
-    
+                route_groups[route_key] = {
+                    'route_number': route['route_number'],
+                    'area': area_name,
+                    'checkin_status': checkin_status,
+                    'students': []
+                }
+            
+            route_groups[route_key]['students'].append({
+                'student_id': student_id,
+                'name': student['name']
+            })
+        else:
+            # Student has no route assignment
+            no_route_students.append({
+                'student_id': student_id,
+                'name': student['name']
+            })
+
     # Sort students within each route group by name
     for group in route_groups.values():
-        group['students'].sort(key=lambda x: x['name'])
+        group['students'].sort(key=itemgetter('name'))
     
     # Sort no-route students by name
-    no_route_students.sort(key=lambda x: x['name'])
+    no_route_students.sort(key=itemgetter('name'))
     
     # Convert to list format and sort by route number
     transport_groups = list(route_groups.values())
-    transport_groups.sort(key=lambda x: x['route_number'])
+    transport_groups.sort(key=itemgetter('route_number'))
     
     # Add no-route group if there are students without routes
     if no_route_students:
@@ -643,25 +643,25 @@ def get_class_checkin_data(class_name):
     not_ready_students = total_students - ready_students
     
     # Add detailed logging for Ext 1 specifically
-    if class_name == 'Ext 1':
-        print(f"EXT1 DEBUG: Returning {len(transport_groups)} route groups")
+    if class_name == 'Ext 1' and app.logger.isEnabledFor(logging.DEBUG):
+        app.logger.debug("EXT1: Returning %s route groups", len(transport_groups))
         for group in transport_groups:
-            print(f"EXT1 DEBUG: Route '{group['route_number']}' ({group['area']}) - {group['checkin_status']} - {len(group['students'])} students")
+            app.logger.debug("EXT1: Route '%s' (%s) - %s - %s students", group['route_number'], group['area'], group['checkin_status'], len(group['students']))
             for student in group['students']:
-                print(f"EXT1 DEBUG:   - {student['name']}")
+                app.logger.debug("EXT1:   - %s", student['name'])
         if no_route_students:
-            print(f"EXT1 DEBUG: {len(no_route_students)} students without routes")
+            app.logger.debug("EXT1: %s students without routes", len(no_route_students))
             for student in no_route_students:
-                print(f"EXT1 DEBUG:   - {student['name']}")
+                app.logger.debug("EXT1:   - %s", student['name'])
     
-    return jsonify({
+    return _with_etag(jsonify({
         'success': True,
         'transport_groups': transport_groups,
         'class_name': class_name,
         'total_students': total_students,
         'ready_students': ready_students,
         'not_ready_students': not_ready_students
-    })
+    }), etag)
 
 
 
@@ -671,19 +671,48 @@ def schools():
     """Route Admin page - comprehensive route management"""
     # Class accounts should not have access to Route Admin - redirect silently
     try:
-        from models import StaffAccount
-        staff_account = StaffAccount.query.filter_by(user_id=current_user.id).first()
+        staff_account = _current_staff_account()
         if staff_account and staff_account.account_type == 'class':
             return redirect(url_for('dashboard'))
     except Exception as e:
         print(f"Error checking staff account: {e}")
     search_query = request.args.get('search', '')
     
+    # Skip the whole enrichment pipeline if the client's copy is still current
+    etag = _page_etag('schools', search_query)
+    if etag and request.headers.get('If-None-Match') == etag:
+        return Response(status=304, headers={'ETag': etag})
+    
     # Get all routes with detailed information
     routes = data_store.get_all_routes()
     providers = data_store.get_all_providers()
     areas = data_store.get_all_areas()
-    students = data_store.get_all_students()
+    
+    # The page only shows student counts, so count them in the database instead
+    # of loading every student; the student dicts are only needed for debug output
+    debug_enabled = app.logger.isEnabledFor(logging.DEBUG)
+    student_counts = data_store.count_students_by_route()
+    students_by_route = {}
+    if debug_enabled:
+        for student in data_store.iter_all_students():
+            students_by_route.setdefault(student.get('route_id'), []).append(student)
+    
+    # Index individual parent routes by provider once, so each route below
+    # is enriched with dict lookups instead of full scans
+    parent_routes_by_provider = {}
+    for route_check_id, route_check in routes.items():
+        if route_check.get('route_number', '').endswith("'s Parent"):
+            parent_routes_by_provider.setdefault(route_check.get('provider_id'), []).append(route_check_id)
+    
+    # Bind the lookups used for every route to locals for the loop below
+    provider_for = providers.get
+    area_for = areas.get
+    student_count_for = student_counts.get
+    parent_routes_for = parent_routes_by_provider.get
+    
+    # Search filtering - lower the query once and match it against one
+    # lowered blob per route; the NUL separator keeps matches within a field
+    query = search_query.lower() if search_query else None
     
     # Enrich routes with additional information, filtering out admin-hidden routes
     enriched_routes = {}
@@ -692,19 +721,17 @@ def schools():
         if route.get('hidden_from_admin', False):
             continue
             
-        enriched_route = route.copy()
+        # get_all_routes() builds fresh dicts per call, so enrich them in place
+        enriched_route = route
         
         # Use existing provider and area info from route data, or look up by ID
         # Try to get provider_name from route data first, then look up by provider_id
         if route.get('provider_name'):
             enriched_route['provider_name'] = route.get('provider_name')
         elif route.get('provider_id'):
-            provider = data_store.get_provider(route.get('provider_id'))
+            provider = provider_for(route.get('provider_id'))
             if provider:
                 enriched_route['provider_name'] = provider['name']
-                # Store it for future use
-                route['provider_name'] = provider['name']
-                data_store.save_data_to_file()  # Persist the update
             else:
                 enriched_route['provider_name'] = 'Unknown Provider'
         else:
@@ -714,70 +741,63 @@ def schools():
         if route.get('area_name'):
             enriched_route['area_name'] = route.get('area_name')
         elif route.get('area_id'):
-            area = data_store.get_area(route.get('area_id'))
+            area = area_for(route.get('area_id'))
             if area:
                 enriched_route['area_name'] = area['name']
-                # Store it for future use
-                route['area_name'] = area['name']
-                data_store.save_data_to_file()  # Persist the update
         elif route['route_number'] == 'Parent':
             # Parent route has no single area - it has multiple pickup areas
             enriched_route['area_name'] = None  # Will be handled by template
         else:
             enriched_route['area_name'] = 'Unknown Area'
         
+        # Names are all the search needs, so skip the rest for routes that don't match
+        if query and query not in f"{route['route_number']}\x00{enriched_route['provider_name'] or ''}\x00{enriched_route.get('area_name') or ''}".lower():
+            continue
+        
         # Get students count - for Parent routes, include all students from individual parent routes
         if route['route_number'] == 'Parent':
             # For Parent route, count students from ALL individual parent routes with same provider
-            route_students = []
-            provider_id = route['provider_id']
-            
-            # Get students assigned to individual parent routes with this provider using route_id system
-            for route_check_id, route_check in routes.items():
-                route_name = route_check.get('route_number', '')
-                if (route_name.endswith("'s Parent") and 
-                    route_check.get('provider_id') == provider_id):
-                    # Add students assigned to this individual parent route
-                    for student in students.values():
-                        if student.get('route_id') == route_check_id:
-                            route_students.append(student)
+            counted_route_ids = parent_routes_for(route['provider_id'], ())
         else:
             # For regular routes, count students where route_id matches
-            route_students = [s for s in students.values() if s.get('route_id') == route_id]
-        enriched_route['students_count'] = len(route_students)
+            counted_route_ids = (route_id,)
+        students_count = sum(student_count_for(counted_route_id, 0) for counted_route_id in counted_route_ids)
+        enriched_route['students_count'] = students_count
         
         # Debug logging for count mismatch issues
-        if len(route_students) > 0 or route['route_number'] == 'E1':
-            student_names = [s.get('name', 'Unknown') for s in route_students]
-            print(f"DEBUG: Route {route['route_number']} (ID: {route_id}) has {len(route_students)} students: {student_names}")
+        if debug_enabled and (students_count > 0 or route['route_number'] == 'E1'):
+            student_names = [s.get('name', 'Unknown')
+                             for counted_route_id in counted_route_ids
+                             for s in students_by_route.get(counted_route_id, ())]
+            app.logger.debug("Route %s (ID: %s) has %d students: %s", route['route_number'], route_id, students_count, student_names)
             
             # For E1 specifically, show all students that might match
             if route['route_number'] == 'E1':
-                print(f"DEBUG: E1 route_id in system: {route_id}")
+                app.logger.debug("E1 route_id in system: %s", route_id)
                 all_students_for_debug = [f"{s.get('name', 'Unknown')} (route_id: {s.get('route_id', 'None')})" 
-                                        for s in students.values() if s.get('route_id') == route_id]
-                print(f"DEBUG: All students with matching route_id {route_id}: {all_students_for_debug}")
+                                        for s in students_by_route.get(route_id, ())]
+                app.logger.debug("All students with matching route_id %s: %s", route_id, all_students_for_debug)
         
         enriched_routes[route_id] = enriched_route
     
-    # Search filtering
-    if search_query:
-        filtered_routes = {}
-        for route_id, route in enriched_routes.items():
-            if (search_query.lower() in route['route_number'].lower() or 
-                search_query.lower() in route['provider_name'].lower() or
-                search_query.lower() in route['area_name'].lower()):
-                filtered_routes[route_id] = route
-        enriched_routes = filtered_routes
+    # Sort routes alphabetically by route number; the template only iterates
+    # them, so a list is enough (each route dict carries its own id)
+    decorated = [(route['route_number'].lower(), route) for route in enriched_routes.values()]
+    decorated.sort(key=itemgetter(0))
+    enriched_routes = [route for _, route in decorated]
     
-    # Sort routes alphabetically by route number
-    enriched_routes = dict(sorted(enriched_routes.items(), key=lambda x: x[1]['route_number'].lower()))
-    
-    return render_template('schools.html', 
+    response = make_response(render_template('schools.html', 
                          routes=enriched_routes, 
                          providers=providers,
                          areas=areas,
-                         search_query=search_query)
+                         search_query=search_query))
+    return _with_etag(response, etag) if etag else response
+
+def _sorted_by_lower_name(students):
+    """Sort student dicts by case-insensitive name, lowering each name once"""
+    decorated = [(student['name'].lower(), student) for student in students]
+    decorated.sort(key=itemgetter(0))
+    return [student for _, student in decorated]
 
 @app.route('/route/<route_id>/students')
 @login_required
@@ -792,85 +812,63 @@ def route_students(route_id):
     came_from = request.args.get('from', 'schools')  # Default to schools (Route Admin)
     
     # Get all students assigned to this route
-    all_students = data_store.get_all_students()
     all_routes = data_store.get_all_routes()
-    route_students = []
-    all_students_list = []
     
-    # For Parent route, get students from individual parent routes OR from the route itself
+    # For Parent route, get students from the individual parent routes with this
+    # provider (both old and new format), each with their route's pickup area
     if route['route_number'] == 'Parent':
-        provider_id = route['provider_id']
-        
-        # Always get students who are assigned to individual parent routes with this provider
-        for route_check_id, route_check in all_routes.items():
-            route_name = route_check.get('route_number', '')
-            # Look for individual parent routes with same provider (both old and new format)
-            if (route_name.endswith("'s Parent") and 
-                route_check.get('provider_id') == provider_id):
-                # Add all students assigned to individual parent routes
-                for student_id, student in all_students.items():
-                    if student.get('route_id') == route_check_id:
-                        student_copy = student.copy()
-                        # Add pickup area info from the individual route
-                        student_copy['pickup_area_id'] = route_check.get('area_id')
-                        route_students.append(student_copy)
+        route_students = list(data_store.get_parent_route_students(route['provider_id']).values())
     else:
         # For regular routes, get students where route_id matches
-        for student_id, student in all_students.items():
-            if student.get('route_id') == route_id:
-                route_students.append(student)
-    
-    # Build all_students_list for the "Add Students" modal (for all route types)
-    for student_id, student in all_students.items():
-        student_copy = student.copy()
-        if student.get('route_id') and student.get('route_id') in all_routes:
-            student_copy['route_name'] = all_routes[student.get('route_id')]['route_number']
-        all_students_list.append(student_copy)
+        route_students = list(data_store.get_students_for_route(route_id).values())
     
     # Debug logging for route students page
-    student_names = [s.get('name', 'Unknown') for s in route_students]
-    print(f"DEBUG: Route students page - Route {route['route_number']} shows {len(route_students)} students: {student_names}")
+    if app.logger.isEnabledFor(logging.DEBUG):
+        student_names = [s.get('name', 'Unknown') for s in route_students]
+        app.logger.debug("Route students page - Route %s shows %d students: %s", route['route_number'], len(route_students), student_names)
     
     # Sort students by name alphabetically
-    route_students.sort(key=lambda s: s['name'].lower())
-    all_students_list.sort(key=lambda s: s['name'].lower())
+    route_students = _sorted_by_lower_name(route_students)
     
-    # Get provider and area info
+    # Get all areas for the dropdown, and this route's provider and area info
+    all_areas = data_store.get_all_areas()
     provider = data_store.get_provider(route['provider_id'])
-    area = data_store.get_area(route['area_id'])
+    area = all_areas.get(route['area_id'])
     
     # Add provider_name to route for JavaScript access
     route['provider_name'] = provider['name'] if provider else 'Unknown Provider'
     
-    # For Parent routes, add pickup area information to each student
-    if route['route_number'] == 'Parent':
-        for student in route_students:
-            # Find the individual route for this student to get their pickup area
-            # Use full name to avoid collisions when students have same first name
-            child_route_number = f"{student['name']}'s Parent"
-            
-            # Look for the individual route
-            for route_id_check, route_check in all_routes.items():
-                if (route_check['route_number'] == child_route_number and 
-                    route_check['provider_id'] == route['provider_id']):
-                    student['pickup_area_id'] = route_check.get('area_id')
-                    break
-            else:
-                student['pickup_area_id'] = None
-    
-    # Get all areas for the dropdown
-    all_areas = data_store.get_all_areas()
-    
     return render_template('route_students.html', 
                          route=route,
                          students=route_students,
-                         all_students=all_students_list,
                          provider=provider,
                          area=area,
                          areas=all_areas,
                          came_from=came_from,
                          all_routes=all_routes)
 
+@app.route('/route/<route_id>/candidate-students')
+@login_required
+def route_candidate_students(route_id):
+    """Students for the "Add Students" modal, fetched when the modal is opened"""
+    if not data_store.get_route(route_id):
+        return jsonify({'success': False, 'error': 'Route not found'}), 404
+    
+    all_routes = data_store.get_all_routes()
+    
+    def candidate(student):
+        student_route = all_routes.get(student.get('route_id'))
+        return {
+            'id': student['id'],
+            'name': student.get('name', ''),
+            'class_name': student.get('class_name'),
+            'route_id': student.get('route_id'),
+            'route_name': student_route['route_number'] if student_route else None,
+        }
+    
+    students = _sorted_by_lower_name(data_store.iter_all_students())
+    return jsonify({'success': True, 'students': [candidate(student) for student in students]})
+
 @app.route('/routes/<route_id>/remove-student', methods=['POST'])
 @login_required
 def remove_student_from_route_admin(route_id):
@@ -954,27 +952,18 @@ def edit_student_ajax(student_id):
         if not name:
             return jsonify({'success': False, 'error': 'Student name is required'})
         
-        # Validate text inputs for profanity
-        text_fields = [
+        # Validate text inputs (and safeguarding notes if present) for profanity
+        safeguarding_notes = request.form.get('safeguarding_notes', '').strip()
+        is_valid, error_msg = profanity_filter.validate_educational_batch([
             (name, "student name"),
             (class_name, "class name"),
             (parent_name, "parent name"),
             (address, "address"),
-            (medical_notes, "medical notes") if medical_notes else (None, None)
-        ]
-        
-        for text, field_name in text_fields:
-            if text and field_name:
-                is_valid, error_msg = profanity_filter.validate_educational_content(text, field_name)
-                if not is_valid:
-                    return jsonify({'success': False, 'error': error_msg})
-        
-        # Also check safeguarding notes if present
-        safeguarding_notes = request.form.get('safeguarding_notes', '').strip()
-        if safeguarding_notes:
-            is_valid, error_msg = profanity_filter.validate_educational_content(safeguarding_notes, "safeguarding notes")
-            if not is_valid:
-                return jsonify({'success': False, 'error': error_msg})
+            (medical_notes, "medical notes"),
+            (safeguarding_notes, "safeguarding notes")
+        ])
+        if not is_valid:
+            return jsonify({'success': False, 'error': error_msg})
         
         # Update student
         updated_student = data_store.update_student(student_id,
@@ -1025,12 +1014,10 @@ def add_school():
         if contact2_role:
             text_fields.append((contact2_role, "secondary contact role"))
         
-        for text, field_name in text_fields:
-            if text:
-                is_valid, error_msg = profanity_filter.validate_educational_content(text, field_name)
-                if not is_valid:
-                    flash(error_msg, 'error')
-                    return redirect(url_for('schools'))
+        is_valid, error_msg = profanity_filter.validate_educational_batch(text_fields)
+        if not is_valid:
+            flash(error_msg, 'error')
+            return redirect(url_for('schools'))
         
         if name and address and contact1_name and contact1_role and contact1_email and contact1_phone:
             school = data_store.create_school(name, address, contact1_name, contact1_role, contact1_email, contact1_phone,
@@ -1161,10 +1148,7 @@ def add_route_admin():
     
     if route_number and provider_id and area_id:
         # Check for duplicate route name
-        existing_routes = data_store.get_all_routes()
-        route_names = [route.get('route_number', '').lower() for route in existing_routes.values()]
-        
-        if route_number.lower() in route_names:
+        if data_store.route_number_exists(route_number):
             flash(f'Route "{route_number}" already exists! Please choose a different name.', 'error')
             return redirect(url_for('schools'))
         
@@ -1196,16 +1180,9 @@ def edit_route_admin(route_id):
     
     if route_number and provider_id and area_id:
         # Check for duplicate route name (excluding current route)
-        existing_routes = data_store.get_all_routes()
-        for existing_id, existing_route in existing_routes.items():
-            if (existing_id != route_id and 
-                existing_route.get('route_number', '').lower() == route_number.lower()):
-                flash(f'Route "{route_number}" already exists! Please choose a different name.', 'error')
-                return redirect(url_for('schools'))
-        
-        # Get provider and area names for the new data structure
-        provider = data_store.get_provider(provider_id)
-        area = data_store.get_area(area_id)
+        if data_store.route_number_exists(route_number, exclude_route_id=route_id):
+            flash(f'Route "{route_number}" already exists! Please choose a different name.', 'error')
+            return redirect(url_for('schools'))
         
         data_store.update_route(route_id, 
             route_number=route_number,
@@ -1255,6 +1232,7 @@ def download_routes_csv_template():
     response = make_response(csv_content)
     response.headers['Content-Type'] = 'text/csv'
     response.headers['Content-Disposition'] = 'attachment; filename=routes_template.csv'
+    response.headers['Cache-Control'] = 'public, max-age=3600'
     return response
 
 @app.route('/routes/bulk-upload', methods=['POST'])
@@ -1275,8 +1253,8 @@ def bulk_upload_routes():
         return redirect(url_for('schools'))
     
     try:
-        csv_content = file.read().decode('utf-8')
-        results = data_store.process_routes_csv(csv_content)
+        csv_stream = io.TextIOWrapper(file.stream, encoding='utf-8-sig', newline='')
+        results = data_store.process_routes_csv(csv_stream)
         
         # Display results
         success_count = len(results['success'])
@@ -1347,6 +1325,10 @@ def school_detail(school_id):
         flash('School not found!', 'error')
         return redirect(url_for('schools'))
     
+    etag = _page_etag('school', school_id)
+    if etag and request.headers.get('If-None-Match') == etag:
+        return Response(status=304, headers={'ETag': etag})
+    
     school_routes = data_store.get_school_routes(school_id)
     drivers = data_store.get_available_drivers()
     guides = data_store.get_staff_by_type('guide')
@@ -1356,16 +1338,18 @@ def school_detail(school_id):
     providers = data_store.get_all_providers()
     areas = data_store.get_school_areas(school_id)
     
+    status_classes = data_store.ROUTE_STATUS_CLASSES
+    status_texts = data_store.ROUTE_STATUS_TEXTS
     for route in school_routes.values():
-        provider = data_store.get_provider(route['provider_id'])
-        area = data_store.get_area(route['area_id'])
+        provider = providers.get(route['provider_id'])
+        area = areas.get(route['area_id'])
         
         route['provider_name'] = provider['name'] if provider else 'Unknown Provider'
         route['area_name'] = area['name'] if area else 'Unknown Area'
-        route['status_color'] = data_store.get_route_status_color(route['status'])
-        route['status_text'] = data_store.get_route_status_text(route['status'])
+        route['status_color'] = status_classes.get(route['status'], 'btn-secondary')
+        route['status_text'] = status_texts.get(route['status'], 'Unknown')
     
-    return render_template('school_detail.html', 
+    response = make_response(render_template('school_detail.html', 
                          school=school, 
                          routes=school_routes,
                          providers=providers,
@@ -1373,7 +1357,8 @@ def school_detail(school_id):
                          drivers=drivers,
                          guides=guides,
                          students=students,
-                         staff_dict=data_store.get_all_staff())
+                         staff_dict=data_store.get_all_staff()))
+    return _with_etag(response, etag) if etag else response
 
 @app.route('/schools/<school_id>/routes/add', methods=['POST'])
 @login_required
@@ -1551,11 +1536,9 @@ def delete_area_admin():
         return jsonify({'success': False, 'message': 'Area not found'})
     
     # Check if area has routes assigned
-    routes = data_store.get_all_routes()
-    routes_using_area = [r for r in routes.values() if r.get('area_id') == area_id]
-    
-    if routes_using_area:
-        route_names = [r.get('route_number', 'Unknown') for r in routes_using_area]
+    if data_store.area_has_routes(area_id):
+        routes_using_area = data_store.get_routes_by_area(area_id)
+        route_names = [r.get('route_number', 'Unknown') for r in routes_using_area.values()]
         return jsonify({
             'success': False, 
             'message': f'Cannot delete area. It is used by routes: {", ".join(route_names)}'
@@ -1679,7 +1662,9 @@ def delete_area(area_id):
         return redirect(url_for('schools'))
     
     school_id = area['school_id']
-    if data_store.delete_area(area_id):
+    if data_store.area_has_routes(area_id):
+        flash('Cannot delete area while routes are assigned to it!', 'error')
+    elif data_store.delete_area(area_id):
         flash('Area deleted successfully!', 'success')
     else:
         flash('Area not found!', 'error')
@@ -1793,7 +1778,6 @@ def cycle_route_status(route_id):
     print(f"DEBUG: cycle_route_status called with route_id: {route_id}")
     
     # Add rate limiting to prevent rapid cycling (reduced to 0.5 seconds for better responsiveness)
-    import time
     last_update_key = f"route_update_{route_id}"
     current_time = time.time()
     
@@ -1873,8 +1857,7 @@ def routes():
     """All routes management page"""
     # Class accounts should not have access to Transport Check-in - redirect silently  
     try:
-        from models import StaffAccount
-        staff_account = StaffAccount.query.filter_by(user_id=current_user.id).first()
+        staff_account = _current_staff_account()
         if staff_account and staff_account.account_type == 'class':
             return redirect(url_for('dashboard'))
     except Exception as e:
@@ -1967,16 +1950,18 @@ def routes():
             break
     
     # Add additional information to routes for display
+    status_classes = data_store.ROUTE_STATUS_CLASSES
+    status_texts = data_store.ROUTE_STATUS_TEXTS
     for route_id, route in all_routes.items():
         # Look up actual provider and area names
-        provider = data_store.get_provider(route.get('provider_id'))
-        area = data_store.get_area(route.get('area_id'))
+        provider = providers.get(route.get('provider_id'))
+        area = all_areas.get(route.get('area_id'))
         
         route['school_name'] = route.get('school_name', 'Hamilton Primary')
         route['provider_name'] = provider['name'] if provider else 'Unknown Provider'
         route['area_name'] = area['name'] if area else 'Unknown Area'
-        route['status_color'] = data_store.get_route_status_color(route['status'])
-        route['status_text'] = data_store.get_route_status_text(route['status'])
+        route['status_color'] = status_classes.get(route['status'], 'btn-secondary')
+        route['status_text'] = status_texts.get(route['status'], 'Unknown')
         
         # CRITICAL FIX: Add student count calculation for Check-in page
         # Get students count - for Parent routes, include all students from individual parent routes
@@ -2022,8 +2007,6 @@ def routes():
                 school_areas[area_id] = area
         areas_by_school[school_id] = school_areas
     
-    import json
-    from datetime import datetime
     
     def json_serialize(obj):
         """Custom JSON serializer for datetime objects"""
@@ -2065,11 +2048,11 @@ def routes():
 @login_required
 def get_route_safeguarding_alerts(route_id):
     """Get safeguarding alerts for students on a specific route"""
-    students = data_store.get_all_students()
+    students = data_store.get_students_for_route(route_id)
     
     safeguarding_students = []
     for student_id, student in students.items():
-        if student.get('route_id') == route_id and student.get('safeguarding_notes'):
+        if student.get('safeguarding_notes'):
             if len(student.get('safeguarding_notes', '')) > 0:
                 safeguarding_students.append({
                     'student_id': student_id,
@@ -2083,18 +2066,17 @@ def get_route_safeguarding_alerts(route_id):
 @login_required
 def get_route_pediatric_first_aid_alerts(route_id):
     """Get pediatric first aid alerts for students on a specific route"""
-    students = data_store.get_all_students()
+    students = data_store.get_students_for_route(route_id)
     
     pediatric_students = []
     for student_id, student in students.items():
-        if student.get('route_id') == route_id:
-            requires_pediatric = student.get('requires_pediatric_first_aid')
-            if requires_pediatric == 'True' or requires_pediatric == True or requires_pediatric == 'true':
-                pediatric_students.append({
-                    'student_id': student_id,
-                    'name': student['name'],
-                    'medical_notes': student.get('medical_notes', '')
-                })
+        requires_pediatric = student.get('requires_pediatric_first_aid')
+        if requires_pediatric == 'True' or requires_pediatric == True or requires_pediatric == 'true':
+            pediatric_students.append({
+                'student_id': student_id,
+                'name': student['name'],
+                'medical_notes': student.get('medical_notes', '')
+            })
     
     return jsonify({'students': pediatric_students})
 
@@ -2116,14 +2098,13 @@ def route_details(route_id):
     # For parent routes, find the matching student by name regardless of route assignment
     if "'s Parent" in route.get('route_number', ''):
         route_student_name = route.get('route_number', '').replace("'s Parent", "")
-        all_students = data_store.get_all_students()
-        for student_id, student in all_students.items():
+        for student in data_store.iter_all_students():
             if student.get('route_id') == route_id:
                 # Student properly assigned to this parent route
-                students.append((student_id, student))
+                students.append((student['id'], student))
             elif student.get('name') == route_student_name:
                 # Student name matches but assigned elsewhere - use for contact info anyway
-                students.append((student_id, student))
+                students.append((student['id'], student))
     
     # Also check the standard way (for non-parent routes)
     for student_id in route.get('student_ids', []):
@@ -2198,13 +2179,8 @@ def bulk_update_route_status():
     if status not in valid_statuses:
         return jsonify({'success': False, 'error': 'Invalid status specified'})
     
-    # Update each route
-    updated_count = 0
-    for route_id in route_ids:
-        route = data_store.get_route(route_id)
-        if route:
-            data_store.update_route_status(route_id, status)
-            updated_count += 1
+    # Update all selected routes in one statement
+    updated_count = data_store.bulk_update_route_status(route_ids, status)
     
     # Get status display information
     status_text = data_store.get_route_status_text(status)
@@ -2274,10 +2250,9 @@ def get_routes_by_status(status):
     
     # Filter by class if specified
     if class_filter:
-        all_students = data_store.get_all_students()
         # Get student routes for the specific class
         class_student_routes = set()
-        for student_id, student in all_students.items():
+        for student in data_store.iter_all_students():
             if student.get('class') == class_filter and student.get('route_id'):
                 class_student_routes.add(student['route_id'])
         
@@ -2331,12 +2306,7 @@ def reset_all_routes():
         routes_to_reset = all_routes
     
     # Reset filtered routes to Not Present status
-    updated_count = 0
-    for route_id, route in routes_to_reset.items():
-        # Reset route status to not_present
-        data_store.update_route_status(route_id, 'not_present')
-        route['updated_at'] = datetime.now()
-        updated_count += 1
+    updated_count = data_store.bulk_update_route_status(list(routes_to_reset), 'not_present')
     
     area_name = all_areas[area_id]['name'] if area_id and area_id in all_areas else "all areas"
     print(f"DEBUG: Reset {updated_count} routes in {area_name} to Not Present")
@@ -2369,7 +2339,6 @@ def staff():
     class_names = data_store.get_unique_class_names()
     
     # Enrich staff data with user information
-    from models import StaffAccount, User
     enriched_staff = {}
     
     # First, process existing staff from data store
@@ -2388,7 +2357,6 @@ def staff():
                 enriched_staff[staff_id]['user_active'] = staff_account.user.active
                 
                 # Get class assignments for class accounts
-                from models import StaffClassAssignment
                 class_assignments = StaffClassAssignment.query.filter_by(staff_account_id=staff_account.id).all()
                 enriched_staff[staff_id]['class_assignments'] = [assignment.class_name for assignment in class_assignments]
             else:
@@ -2405,8 +2373,7 @@ def staff():
             print(f"DEBUG: Found database staff {staff_account.staff_id} not in data store - adding to display")
             # Check if there's a separate display name stored in Staff table
             try:
-                from models import Staff
-                staff_record = Staff.query.get(staff_account.staff_id)
+                staff_record = db.session.get(Staff, staff_account.staff_id)
                 display_name = staff_record.display_name if staff_record and staff_record.display_name else staff_account.user.username
             except Exception as e:
                 print(f"DEBUG: Error accessing Staff table for {staff_account.staff_id}: {e}")
@@ -2429,7 +2396,6 @@ def staff():
             }
             
             # Get class assignments for class accounts
-            from models import StaffClassAssignment
             class_assignments = StaffClassAssignment.query.filter_by(staff_account_id=staff_account.id).all()
             enriched_staff[staff_account.staff_id]['class_assignments'] = [assignment.class_name for assignment in class_assignments]
             print(f"DEBUG: Staff {staff_account.staff_id} class_assignments: {enriched_staff[staff_account.staff_id]['class_assignments']}")
@@ -2453,8 +2419,6 @@ def add_staff():
         flash('Access denied. Admin privileges required.', 'error')
         return redirect(url_for('staff'))
     
-    from models import User, StaffAccount, StaffClassAssignment
-    from app import db
     
     if request.method == 'POST':
         name = request.form.get('name')
@@ -2558,12 +2522,10 @@ def edit_staff(staff_id):
     staff_member = data_store.get_staff(staff_id)
     if not staff_member:
         # Check if this is a database-only staff member
-        from models import StaffAccount, User
         staff_account = StaffAccount.query.filter_by(staff_id=staff_id).first()
         if staff_account and staff_account.user:
             # Get the display name from Staff table or use username as fallback
-            from models import Staff
-            staff_record = Staff.query.get(staff_id)
+            staff_record = db.session.get(Staff, staff_id)
             display_name = staff_record.display_name if staff_record else staff_account.user.username
             
             # Create a temporary staff_member dict for database-only staff
@@ -2602,8 +2564,6 @@ def edit_staff(staff_id):
             selected_classes = request.form.getlist('class_assignments')
         
         try:
-            from models import StaffAccount, StaffClassAssignment, User
-            from app import db
             
             # Find existing staff account and user
             staff_account = StaffAccount.query.filter_by(staff_id=staff_id).first()
@@ -2651,8 +2611,7 @@ def edit_staff(staff_id):
                 db.session.add(assignment)
             
             # Update the Staff table directly to store display name
-            from models import Staff
-            staff_record = Staff.query.get(staff_id)
+            staff_record = db.session.get(Staff, staff_id)
             if staff_record:
                 # Update existing staff record
                 staff_record.display_name = display_name
@@ -2687,22 +2646,7 @@ def check_admin_access():
     if not current_user.is_authenticated:
         return False
     
-    try:
-        # Check special admin usernames - use the same logic as admin_required decorator
-        if hasattr(current_user, 'username'):
-            if current_user.username in ['admin', 'gfokti', 'Gfokti']:
-                return True
-        
-        # Check staff account type
-        from models import StaffAccount
-        staff_account = StaffAccount.query.filter_by(user_id=current_user.id).first()
-        if staff_account and staff_account.account_type == 'admin':
-            return True
-            
-    except Exception as e:
-        print(f"DEBUG: Error checking admin access: {e}")
-    
-    return False
+    return is_admin_user()
 
 @app.route('/staff/<staff_id>/delete', methods=['POST'])
 @login_required
@@ -2806,9 +2750,6 @@ def create_staff_account(staff_id):
         flash('Account type is required!', 'error')
         return redirect(url_for('staff'))
     
-    from models import User, StaffAccount
-    from app import db
-    import uuid
     
     try:
         # Create User record
@@ -2866,8 +2807,6 @@ def manage_staff_account(staff_id):
         flash('Account type is required!', 'error')
         return redirect(url_for('staff'))
     
-    from models import StaffAccount
-    from app import db
     
     try:
         # Find and update the StaffAccount record
@@ -2903,8 +2842,6 @@ def deactivate_staff_account(staff_id):
         flash('Staff member not found!', 'error')
         return redirect(url_for('staff'))
     
-    from models import StaffAccount
-    from app import db
     
     try:
         # Find and deactivate the StaffAccount record
@@ -2940,6 +2877,7 @@ def students_csv_template():
     response = make_response(csv_content)
     response.headers['Content-Type'] = 'text/csv'
     response.headers['Content-Disposition'] = 'attachment; filename=students_template.csv'
+    response.headers['Cache-Control'] = 'public, max-age=3600'
     return response
 
 @app.route('/students/csv-upload', methods=['POST'])
@@ -2966,13 +2904,11 @@ def students_csv_upload():
     
     if file and file.filename.endswith('.csv'):
         try:
-            print("DEBUG STUDENT_UPLOAD: Reading CSV content")
-            csv_content = file.read().decode('utf-8')
-            print(f"DEBUG STUDENT_UPLOAD: CSV content length: {len(csv_content)} characters")
-            print(f"DEBUG STUDENT_UPLOAD: First 200 chars: {csv_content[:200]}")
+            print("DEBUG STUDENT_UPLOAD: Streaming CSV content")
+            csv_stream = io.TextIOWrapper(file.stream, encoding='utf-8-sig', newline='')
             
             print("DEBUG STUDENT_UPLOAD: Processing CSV")
-            results = data_store.process_students_csv(csv_content)
+            results = data_store.process_students_csv(csv_stream)
             print(f"DEBUG STUDENT_UPLOAD: Processing result: {results}")
             
             if isinstance(results, dict) and 'success' in results and results['success']:
@@ -3017,7 +2953,7 @@ def students():
     is_admin = False
     try:
         # Direct username check first
-        if hasattr(current_user, 'username') and current_user.username in ['admin', 'gfokti', 'Gfokti']:
+        if hasattr(current_user, 'username') and _is_admin_username(current_user.username):
             is_admin = True
             print(f"DEBUG STUDENTS_PAGE: Admin access granted via username: {current_user.username}")
     except Exception as e:
@@ -3025,8 +2961,7 @@ def students():
     
     # Class accounts should not have access to Student Management (unless they're admin)
     try:
-        from models import StaffAccount
-        staff_account = StaffAccount.query.filter_by(user_id=current_user.id).first()
+        staff_account = _current_staff_account()
         print(f"DEBUG STUDENTS_PAGE: StaffAccount found: {staff_account is not None}")
         if staff_account:
             print(f"DEBUG STUDENTS_PAGE: StaffAccount type: {staff_account.account_type}")
@@ -3064,7 +2999,6 @@ def students():
     def sort_route_key(item):
         route_number = item[1]['route_number']
         # Try to extract numeric part for proper numeric sorting
-        import re
         numeric_match = re.match(r'^(\d+)', route_number)
         if numeric_match:
             # If it starts with a number, sort by number first, then by the full string
@@ -3091,7 +3025,7 @@ def students():
     sorted_classes = sorted(available_classes, key=lambda x: (int(x) if x.isdigit() else float('inf'), x))
     
     # Also pass all routes (including individual parent routes) for student assignment display
-    all_routes_for_display = data_store.get_all_routes()
+    all_routes_for_display = all_routes
     
     # Get all areas for pickup location selection
     all_areas = data_store.get_all_areas()
@@ -3128,23 +3062,19 @@ def add_student():
         
         if name and class_name and parent_name and parent_phone and address:
             # Validate text inputs for profanity before creating student
-            text_fields = [
+            is_valid, error_msg = profanity_filter.validate_educational_batch([
                 (name, "student name"),
                 (class_name, "class name"),
                 (parent_name, "parent name"),
-                (parent2_name, "second parent name") if parent2_name else (None, None),
+                (parent2_name, "second parent name"),
                 (address, "address"),
-                (medical_notes, "medical notes") if medical_notes else (None, None),
-                (safeguarding_notes, "safeguarding notes") if safeguarding_notes else (None, None)
-            ]
-            
-            for text, field_name in text_fields:
-                if text and field_name:
-                    is_valid, error_msg = profanity_filter.validate_educational_content(text, field_name)
-                    if not is_valid:
-                        flash(error_msg, 'error')
-                        all_routes_for_display = data_store.get_all_routes()
-                        return render_template('students.html', students=data_store.get_all_students(), show_add_form=True, all_routes=all_routes_for_display)
+                (medical_notes, "medical notes"),
+                (safeguarding_notes, "safeguarding notes")
+            ])
+            if not is_valid:
+                flash(error_msg, 'error')
+                all_routes_for_display = data_store.get_all_routes()
+                return render_template('students.html', students=data_store.get_all_students(), show_add_form=True, all_routes=all_routes_for_display)
             
             try:
                 student = data_store.create_student(name, grade, class_name, parent_name, parent_phone, address, 
@@ -3190,26 +3120,18 @@ def edit_student(student_id):
                 flash('All required fields must be filled in', 'error')
             else:
                 # Validate text inputs for profanity
-                text_fields = [
+                is_valid, error_msg = profanity_filter.validate_educational_batch([
                     (name, "student name"),
                     (class_name, "class name"),
                     (parent_name, "parent name"),
-                    (parent2_name, "second parent name") if parent2_name else (None, None),
+                    (parent2_name, "second parent name"),
                     (address, "address"),
-                    (medical_notes, "medical notes") if medical_notes else (None, None),
-                    (safeguarding_notes, "safeguarding notes") if safeguarding_notes else (None, None)
-                ]
-                
-                profanity_found = False
-                for text, field_name in text_fields:
-                    if text and field_name:
-                        is_valid, error_msg = profanity_filter.validate_educational_content(text, field_name)
-                        if not is_valid:
-                            flash(error_msg, 'error')
-                            profanity_found = True
-                            break
+                    (medical_notes, "medical notes"),
+                    (safeguarding_notes, "safeguarding notes")
+                ])
                 
-                if profanity_found:
+                if not is_valid:
+                    flash(error_msg, 'error')
                     all_students = data_store.get_all_students()
                     sorted_students = dict(sorted(all_students.items(), key=lambda x: x[1]['name'].lower()))
                     all_routes_for_display = data_store.get_all_routes()
@@ -3262,19 +3184,7 @@ from app import csrf
 def delete_student(student_id):
     """Delete a student"""
     # Check admin permissions using the same logic as the students page
-    is_admin = False
-    if hasattr(current_user, 'username') and current_user.username in ['admin', 'gfokti', 'Gfokti']:
-        is_admin = True
-    else:
-        try:
-            from models import StaffAccount
-            staff_account = StaffAccount.query.filter_by(user_id=current_user.id).first()
-            if staff_account and staff_account.account_type == 'admin':
-                is_admin = True
-        except Exception:
-            pass
-    
-    if not is_admin:
+    if not is_admin_user():
         flash('Access denied. Admin privileges required.', 'error')
         return redirect(url_for('students'))
     
@@ -3316,7 +3226,6 @@ def bulk_assign_students():
         if route_id:
             # Validate route_id is a proper UUID format and route exists
             try:
-                import uuid
                 uuid.UUID(route_id)  # Validate UUID format
                 route = data_store.get_route(route_id)
                 if route:
@@ -3340,23 +3249,23 @@ def bulk_assign_students():
         flash('Please select a pickup location for parent collection.', 'error')
         # Check if we came from route students page and redirect accordingly
         from_route = request.form.get('from_route')
-        if from_route and route_id:
-            # Validate route_id is a valid UUID and route exists before redirecting
-            try:
-                import uuid
-                # Validate route_id is a proper UUID format
-                uuid.UUID(route_id)
-                route = data_store.get_route(route_id)
-                if route:
-                    return redirect(url_for('route_students', route_id=route_id))
-            except (ValueError, TypeError):
-                pass
+        if from_route:
+            # The route was looked up above, so it is known to exist
+            return redirect(url_for('route_students', route_id=route_id))
         return redirect(url_for('students'))
     
     # Count successful assignments and track created routes for parent assignments
     assigned_count = 0
     last_created_route_id = None
     
+    # Individual parent routes for this provider by route number, loaded once
+    # for the whole batch and kept up to date as routes are created below
+    child_routes_by_number = {}
+    if is_parent_provider:
+        for existing_route in data_store.get_all_routes().values():
+            if existing_route['provider_id'] == route['provider_id']:
+                child_routes_by_number.setdefault(existing_route['route_number'], existing_route)
+    
     for student_id in student_ids:
         if student_id.strip():
             student = data_store.get_student(student_id.strip())
@@ -3370,18 +3279,12 @@ def bulk_assign_students():
                     child_route_number = f"{student['name']}'s Parent"
                     
                     # Check if individual route already exists
-                    existing_routes = data_store.get_all_routes()
-                    existing_route_id = None
-                    for existing_id, existing_route in existing_routes.items():
-                        if (existing_route['route_number'] == child_route_number and 
-                            existing_route['provider_id'] == route['provider_id']):
-                            existing_route_id = existing_id
-                            break
+                    individual_route = child_routes_by_number.get(child_route_number)
                     
-                    if existing_route_id:
+                    if individual_route:
                         # Use existing individual route but update its pickup location
+                        existing_route_id = individual_route['id']
                         print(f"DEBUG: Assigning {student['name']} to existing individual route {child_route_number} with pickup location {pickup_location}")
-                        individual_route = data_store.get_route(existing_route_id)
                         individual_route['hidden_from_admin'] = True  # Hidden from Route Admin but visible in Transport Check-in
                         individual_route['area_id'] = pickup_location  # Update pickup location
                         child_route_id = existing_route_id
@@ -3410,6 +3313,13 @@ def bulk_assign_students():
                             hidden_from_admin=True  # Mark as hidden from Route Admin but visible in Transport Check-in
                         )
                         last_created_route_id = child_route_id
+                        child_routes_by_number[child_route_number] = {
+                            'id': child_route_id,
+                            'route_number': child_route_number,
+                            'provider_id': route['provider_id'],
+                            'area_id': pickup_location,
+                            'hidden_from_admin': True,
+                        }
                     
                     # Assign student ONLY to the individual route (not the generic Parent route)
                     # This ensures class check-in shows individual routes like "Freya's Parent"
@@ -3431,8 +3341,9 @@ def bulk_assign_students():
     else:
         flash('No students were assigned.', 'error')
     
-    # Check where to redirect based on came_from parameter
-    original_route_id = request.form.get('route_id')
+    # Check where to redirect based on came_from parameter; this is the
+    # route validated above, so it does not need to be looked up again
+    original_route_id = route_id
     came_from = request.form.get('came_from', 'schools')
     from_route = request.form.get('from_route')
     
@@ -3443,14 +3354,14 @@ def bulk_assign_students():
     
     # Priority 1: If came_from is 'students', redirect to route page with from parameter
     if came_from == 'students':
-        if original_route_id and data_store.get_route(original_route_id):
+        if original_route_id:
             return redirect(url_for('route_students', route_id=original_route_id, **{'from': 'students'}))
         else:
             # If no valid route_id, fall back to students page
             return redirect(url_for('students'))
     
     # Priority 2: If we have a valid original_route_id, redirect to that route
-    if original_route_id and data_store.get_route(original_route_id):
+    if original_route_id:
         # For parent assignments, redirect to the main Parent route
         if is_parent_provider:
             return redirect(url_for('route_students', route_id=original_route_id))
@@ -3652,12 +3563,14 @@ def sync_data(page):
     if page == 'routes':
         routes = data_store.get_all_routes()
         route_data = {}
+        status_classes = data_store.ROUTE_STATUS_CLASSES
+        status_texts = data_store.ROUTE_STATUS_TEXTS
         
         for route_id, route in routes.items():
             route_data[route_id] = {
                 'status': route['status'],
-                'status_text': data_store.get_route_status_text(route['status']),
-                'status_color': data_store.get_route_status_color(route['status']),
+                'status_text': status_texts.get(route['status'], 'Unknown'),
+                'status_color': status_classes.get(route['status'], 'btn-secondary'),
                 'guide_present': route.get('guide_present', False)
             }
         